@@ -0,0 +1,209 @@
+'''
+    Filename: run_benchmarks.py
+    Purpose: To time each stage of the pipeline (parsing the scraped pages, matching up player names, fantasy scoring, stat store lookups, squad picking & projections) on synthetic
+             fixtures, so slow downs show up without having to scrape the live websites.
+    Usage: python scripts/benchmarks/run_benchmarks.py [--sizes 50 1000 10000] [--stages parse match score query squad project] [--processes 4] [--compare old.json]
+'''
+
+##################################################################################################################################
+''' Initialising script '''
+##################################################################################################################################
+# Import packages
+import os, sys, io, json, time, argparse, contextlib, platform
+import numpy as np
+from itertools import cycle, islice
+from pathlib import Path
+
+# Fixing pathway
+module_path = os.path.abspath(os.path.join(''))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# Output Directory
+filepath = 'data/benchmarks/'
+Path(filepath).mkdir(parents=True, exist_ok=True)
+
+# Import functions
+import scripts.useful_functions as uf
+import scripts.fantasy_scoring as fs
+import scripts.schema as schema
+import scripts.stat_store as stat_store
+import scripts.squad_optimizer as so
+import scripts.projection as pj
+import scripts.benchmarks.synthetic as synthetic
+import scripts.parsing as parsing
+
+# Options
+parser = argparse.ArgumentParser(description='Time each stage of the pipeline on synthetic fixtures')
+parser.add_argument('--sizes', type=int, nargs='+', default=[50,1000,10000], help='Numbers of matches to time each stage at')
+parser.add_argument('--stages', nargs='+', default=['parse','match','score','query','squad','project'], choices=['parse','match','score','query','squad','project'], help='Stages to time')
+parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Number of processes to parse the pages with')
+parser.add_argument('--unique', type=int, default=50, help='Number of distinct fixtures to write html for (the pages are reused beyond this)')
+parser.add_argument('--repeats', type=int, default=1, help='Number of times to time each stage (the fastest time is kept)')
+parser.add_argument('--output', default=f'{filepath}benchmarks.json', help='File to save the timings to')
+parser.add_argument('--compare', default=None, help='Timings from an earlier run to compare against')
+
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# The parsers print each fixture, which would swamp the timings
+def quiet(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+# Parse a fixture's pages without printing
+def parse_rwc(htmls):
+    return len(quiet(parsing.parse_rwc_fixture,htmls))
+
+def parse_espn(match_htmls, stat_htmls):
+    return len(quiet(parsing.parse_espn_fixture,match_htmls,stat_htmls))
+
+def parse_wiki(htmls):
+    return len(quiet(parsing.parse_wiki_page,htmls,2023))
+
+# Match up the names, checking they were matched
+def match_names(df_rwc, df_espn, min_rate = 0.99):
+    '''
+        Purpose: To match up the synthetic names, checking enough of them were matched (so a perturbation the matching misses doesn't go
+                 unnoticed, timing the misses rather than the matches)
+        Output: Number of rows outputted
+    '''
+    df = uf.matching(df_rwc,df_espn)
+    matched = df[df.name_rwc.notna() & df.name_espn.notna()]
+    rate = len(matched[['name_rwc','team']].drop_duplicates()) / len(df_rwc)
+    if rate < min_rate:
+        raise ValueError(f'Only {rate:.1%} of the names were matched up, expected at least {min_rate:.1%}')
+    return len(df)
+
+# Time a function
+def timed(func, repeats = 1):
+    '''
+        Purpose: To time a function, keeping the fastest of the repeats
+        Output: Seconds taken, number of rows outputted
+    '''
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = func()
+        seconds = time.perf_counter() - start
+        best = seconds if best == None else min(best,seconds)
+    return best, rows
+
+# Benchmarks for a number of matches
+def benchmarks(n_matches, stages, processes, unique):
+    '''
+        Purpose: To set up the benchmarks of each stage for a number of matches
+        Inputs:
+            - n_matches = Number of matches
+            - stages = Stages to benchmark
+            - processes = Number of processes to parse the pages with
+            - unique = Number of distinct fixtures to write html for (parsing costs the same for every fixture, so the pages are cycled through)
+        Output: Dictionary of benchmark name to function returning the number of rows outputted
+    '''
+    fixtures = synthetic.make_fixtures(n_matches)
+    out = {}
+
+    # Parsing
+    if 'parse' in stages:
+        sample = fixtures[:unique]
+        rwc = [[synthetic.rwc_pages(x)] for x in sample]
+        espn = [list(synthetic.espn_pages(x)) for x in sample]
+        wiki = [[[synthetic.wiki_page(sample[i:i+10])]] for i in range(0,len(sample),10)]
+        out['parse_rwc'] = lambda: sum(uf.parallel_imap(parse_rwc,islice(cycle(rwc),n_matches),processes))
+        out['parse_espn'] = lambda: sum(uf.parallel_imap(parse_espn,islice(cycle(espn),n_matches),processes))
+        rwc_fragments = [[synthetic.rwc_pages(x,fragments=True)] for x in sample]
+        espn_fragments = [list(synthetic.espn_pages(x,fragments=True)) for x in sample]
+        out['parse_rwc_fragments'] = lambda: sum(uf.parallel_imap(parse_rwc,islice(cycle(rwc_fragments),n_matches),processes))
+        out['parse_espn_fragments'] = lambda: sum(uf.parallel_imap(parse_espn,islice(cycle(espn_fragments),n_matches),processes))
+        out['parse_wiki'] = lambda: sum(uf.parallel_imap(parse_wiki,islice(cycle(wiki),-(-n_matches//10)),processes))
+
+    # Matching up names
+    if 'match' in stages:
+        df_rwc, df_espn = synthetic.name_frames(fixtures)
+        out['matching'] = lambda: match_names(df_rwc,df_espn)
+
+    # Fantasy scoring, with one rule set then with many
+    if 'score' in stages:
+        dataset = synthetic.player_data(fixtures)
+        rulesets = fs.load_rulesets('scripts/rwc_2023/rulesets/')
+        scoring = list(rulesets.values())[0]
+        rng = np.random.default_rng(0)
+        many = {f'ruleset_{i}' : {x : float(rng.integers(-3,6)) for x in scoring} for i in range(50)}
+        keys = ['date','team','opposition','name','no.']
+        out['score'] = lambda: len(fs.score(dataset,scoring,keys))
+        out['score_rulesets'] = lambda: len(fs.score_rulesets(dataset,many,keys))
+
+    # Building the stat store, then looking up a team's forwards in the pool stage & each player's history (1,000 of each)
+    if 'query' in stages:
+        dataset = schema.apply_schema(synthetic.player_data(fixtures),'player_data')
+        store = stat_store.StatStore(dataset)
+        teams, names = store.keys['team'], store.keys['name']
+        out['store_build'] = lambda: len(stat_store.StatStore(dataset))
+        out['store_query'] = lambda: sum([len(store.query(team=teams[i%len(teams)],position='forwards',round=(1,4))) for i in range(1000)])
+        out['store_history'] = lambda: sum([len(store.history(names[i%len(names)])) for i in range(1000)])
+
+    # Picking the best squad with a team cap & budget, for one scenario then for 100 (a team cap & budget each)
+    if 'squad' in stages:
+        dataset = synthetic.player_data(fixtures)
+        scoring = list(fs.load_rulesets('scripts/rwc_2023/rulesets/').values())[0]
+        scores = fs.score(dataset,scoring,['date','team','opposition','name','no.'])
+        prices = scores[['name','team']].drop_duplicates()
+        prices['price'] = np.random.default_rng(0).integers(8,40,len(prices)) / 2
+        candidates = so.candidates(scores,prices=prices)
+        scenarios = [{'name' : f'scenario_{i}', 'team_cap' : 3 + i%3, 'budget' : 200 + i} for i in range(100)]
+        out['squad'] = lambda: len(so.optimize(candidates,team_cap=4,budget=230))
+        out['squad_scenarios'] = lambda: len(so.optimize_scenarios(candidates,scenarios,processes,errors='skip'))
+
+    # Projecting every player's points from 1,000 simulations, then a tournament's squads (20 teams) from 100,000 simulations
+    if 'project' in stages:
+        dataset = synthetic.player_data(fixtures)
+        rulesets = fs.load_rulesets('scripts/rwc_2023/rulesets/')
+        teams = sorted(dataset.team.unique())[:20]
+        out['project'] = lambda: len(pj.project(dataset,rulesets,sims=1000,processes=processes))
+        out['project_squads'] = lambda: len(pj.project(dataset,rulesets,sims=100000,teams=teams,processes=processes))
+        out['project_squads_matches'] = lambda: len(pj.project(dataset,rulesets,sims=100000,method='matches',teams=teams,processes=processes))
+
+    # Output
+    return out
+
+
+
+##################################################################################################################################
+''' Run the benchmarks '''
+##################################################################################################################################
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    # Time each stage at each size
+    results = []
+    for n_matches in args.sizes:
+        print(f'Benchmarking {n_matches} matches')
+        for name, func in benchmarks(n_matches,args.stages,args.processes,args.unique).items():
+            seconds, rows = timed(func,args.repeats)
+            results.append({'benchmark':name, 'matches':n_matches, 'rows':int(rows), 'seconds':round(seconds,4)})
+            print(f'    - {name}: {seconds:.3f}s ({rows} rows)')
+
+    # Compare against an earlier run
+    if args.compare != None:
+        with open(args.compare) as f:
+            previous = {(x['benchmark'],x['matches']) : x['seconds'] for x in json.load(f)['results']}
+        print(f'\nCompared to {args.compare}')
+        for x in results:
+            before = previous.get((x['benchmark'],x['matches']))
+            if before == None or before == 0:
+                continue
+            ratio = x['seconds'] / before
+            flag = '  <-- slower' if ratio > 1.2 else ''
+            print(f'    - {x["benchmark"]} ({x["matches"]} matches): {before:.3f}s -> {x["seconds"]:.3f}s ({ratio:.2f}x){flag}')
+
+    # Save the timings
+    with open(args.output,'w') as f:
+        json.dump({
+            'python' : platform.python_version(),
+            'machine' : platform.machine(),
+            'processes' : args.processes,
+            'results' : results,
+        },f,indent=4)
+    print(f'\nSaved timings to {args.output}')
@@ -0,0 +1,237 @@
+'''
+    Filename: synthetic.py
+    Purpose: Generate synthetic fixtures, with html matching the RWC match centre, ESPN & Wikipedia pages the scrapers parse,
+             and player names that are perturbed between websites to exercise the fuzzy matching.
+'''
+
+##################################################################################################################################
+''' Importing packages '''
+##################################################################################################################################
+# Import packages
+import numpy as np
+import pandas as pd
+from math import ceil
+
+
+##################################################################################################################################
+''' Useful variables '''
+##################################################################################################################################
+# Stat columns on each website's tabs (the RWC tabs start with the No., Team & Player columns)
+rwc_stats = {
+    'General' : ['P','MP','O','CM','HE'],
+    'Attack' : ['P','M','CB','DB','KFH','LW'],
+    'Defence' : ['TA','MT','TS','TW','LS'],
+}
+espn_stats = {
+    'Scoring' : ['T','TA','CG','PG','DGC','PTS'],
+    'Attacking' : ['-','P','R','MR','CB','DB','O'],
+    'Defending' : ['TC','T','MT','LW'],
+    'Discipline' : ['PC','YC','RC'],
+}
+months = ['September','October']
+
+# Menus, links etc. that pad out a full page to roughly the size of the real ones (the stats are a small part of each page)
+padding = ''.join([f'<div class="navigation__item"><a href="/link/{i}">Link {i}</a><span class="navigation__label">Menu item</span></div>' for i in range(300)])
+
+# Syllables used to build names
+syllables = ['ka','lo','ma','ri','te','vu','sa','no','fi','le','an','dre','jo','mi','ke','ta','ru','pe','si','ho','ba','de']
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Make up a name
+def make_name(rng, parts):
+    return ''.join(rng.choice(syllables,parts)).capitalize()
+
+# Make up the teams & their squads
+def make_teams(n_teams, squad_size = 33, seed = 0):
+    '''
+        Purpose: To make up teams, each with a squad of players with unique names
+        Output: Dictionary of team name to list of player names
+    '''
+    rng = np.random.default_rng(seed)
+    teams = {}
+    while len(teams) < n_teams:
+        team = make_name(rng,3)
+        if team in teams:
+            continue
+        squad = set()
+        while len(squad) < squad_size:
+            squad.add(f'{make_name(rng,2)} {make_name(rng,3)}')
+        teams[team] = sorted(squad)
+    return teams
+
+# Make up the fixtures
+def make_fixtures(n_matches, matches_per_team = 10, seed = 0):
+    '''
+        Purpose: To make up a list of fixtures, adding teams as the number of matches grows so each team plays about matches_per_team
+        Output: List of fixtures, each a dictionary with the date, teams & line ups (23 players per team) and the stats of each player
+    '''
+    rng = np.random.default_rng(seed)
+    teams = make_teams(max(2,ceil(2*n_matches/matches_per_team)),seed=seed)
+    names = list(teams)
+    fixtures = []
+    for i in range(n_matches):
+        home, away = rng.choice(len(names),2,replace=False)
+        home, away = names[home], names[away]
+        fixtures.append({
+            'id' : i,
+            'day' : int(rng.integers(1,29)),
+            'month' : months[int(rng.integers(0,2))],
+            'teams' : [home,away],
+            'lineups' : {x : list(rng.choice(teams[x],23,replace=False)) for x in [home,away]},
+            'stats' : {x : rng.integers(0,12,(23,24)) for x in [home,away]},
+            'score' : f'{int(rng.integers(0,60))}–{int(rng.integers(0,60))}',
+        })
+    return fixtures
+
+# Perturb a name the way another website might write it
+def perturb_name(name, rng, typo = 0.1):
+    '''
+        Purpose: To write a name as ESPN does (first initial & surname), with a chance of a typo in the surname
+        Assumptions: The typo drops a letter (after the first) from the surname, which keeps the fuzz.ratio of name_links at least 9 letters
+                     long above uf.matching's threshold of 90, so every typo should still be matched up (swapping two letters wouldn't)
+    '''
+    first, last = name.split(' ',1)
+    if rng.random() < typo and len(last) > 3:
+        i = int(rng.integers(1,len(last)))
+        last = last[:i] + last[i+1:]
+    return f'{first[0]} {last}'
+
+# RWC match centre
+def rwc_pages(fixture, fragments = False):
+    '''
+        Purpose: To write the html of a fixture's RWC match centre, followed by the html after clicking each stat tab
+        Inputs:
+            - fixture = Fixture from make_fixtures
+            - fragments = Only write the stat tab's container after each click (as scraped with a container selector), rather than the whole page
+    '''
+    home, away = fixture['teams']
+    lineups = fixture['lineups']
+
+    # Date, teams & line ups
+    rows = [
+        f'<div class="mc-lineups__player-row"><div class="mc-lineups__player-number">{n+1}</div>'
+        f'<div class="mc-lineups__player-name">{lineups[home][n]}</div><div class="mc-lineups__player-name">{lineups[away][n]}</div></div>'
+        for n in range(23)
+    ]
+    base = (
+        f'<html><body>{padding}<main>'
+        '<div class="date date--rwc2024 match-details__date">'
+        f'<span class="date__unit date__unit--day-number">{fixture["day"]}</span>'
+        f'<span class="date__unit date__unit--month">{fixture["month"]},</span>'
+        '<span class="date__unit date__unit--year">2023</span></div>'
+        f'<div class="mc-lineups__team-name">{home}</div><div class="mc-lineups__team-name">{away}</div>'
+        f'<div class="mc-lineups__team-lineups js-starters">{"".join(rows[:15])}</div>'
+        f'<div class="mc-lineups__substitutes js-substitutes">{"".join(rows[15:])}</div>'
+        '</main></body></html>'
+    )
+
+    # Stat tabs
+    pages = []
+    offset = 0
+    for tab, stats in rwc_stats.items():
+        header = ''.join([f'<th><span class="mc-player-stats__header-cell-content">{x}</span></th>' for x in ['No.','Team','Player'] + stats])
+        body = ''
+        for t, team in enumerate([home,away]):
+            for n, player in enumerate(lineups[team]):
+                cells = [str(n+1),'',player] + [str(x) for x in fixture['stats'][team][n][offset:offset+len(stats)]]
+                body += f'<tr class="mc-player-stats__table-row mc-player-stats__table-row--team-{t+1}">' + ''.join([f'<td class="mc-player-stats__cell">{x}</td>' for x in cells]) + '</tr>'
+        page = f'<div data-ui-tab="{tab}"><table><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table></div>'
+        pages = pages + [page if fragments else f'<html><body>{padding}<main>{page}</main></body></html>']
+        offset += len(stats)
+
+    # Output
+    return [base] + pages
+
+# ESPN match & playerstats pages
+def espn_pages(fixture, seed = 0, fragments = False):
+    '''
+        Purpose: To write the html of a fixture's ESPN match page, and of its playerstats page followed by the html after clicking each stat tab
+        Inputs:
+            - fixture = Fixture from make_fixtures
+            - seed = Seed for perturbing the names
+            - fragments = Only write the stat tab's container after each click (as scraped with a container selector), rather than the whole page
+        Output: [match page], [playerstats page, stat tab pages...]
+    '''
+    rng = np.random.default_rng([seed,fixture['id']])
+    home, away = fixture['teams']
+    names = {x : [perturb_name(y,rng) for y in fixture['lineups'][x]] for x in [home,away]}
+
+    # Match details
+    match = (
+        '<html><body>'
+        f'<div class="competitors"><span class="long-name">{home}</span><span class="long-name">{away}</span></div>'
+        '<div class="col-two"><article class="sub-module game-information">'
+        f'<div class="game-date-time">20:00, {fixture["month"]} {fixture["day"]}, 2023</div></article></div>'
+        '</body></html>'
+    )
+
+    # Stat tabs
+    pages = []
+    offset = 0
+    for tab, stats in espn_stats.items():
+        tables = ''
+        for team in [home,away]:
+            header = '<tr class="header">' + ''.join([f'<th>{x}</th>' for x in ['Player'] + stats]) + '</tr>'
+            body = ''
+            for n, player in enumerate(names[team]):
+                cells = [str(x) if x > 0 else '-' for x in fixture['stats'][team][n][offset:offset+len(stats)]]
+                body += f'<tr><td><span>{"FW" if n < 8 else "BK"}</span><a>{player}</a></td>' + ''.join([f'<td>{x}</td>' for x in cells]) + '</tr>'
+            tables += f'<table class="mod-data"><thead>{header}</thead><tbody>{body}</tbody></table>'
+        page = f'<div class="sub-module tabbedTable">{tables}</div>'
+        pages = pages + [page if fragments else f'<html><body>{padding}{page}</body></html>']
+        offset += len(stats)
+
+    # Output
+    return [match], [f'<html><body>{padding}</body></html>'] + pages
+
+# Wikipedia pool page
+def wiki_page(fixtures):
+    '''
+        Purpose: To write the html of a wikipedia page summarising a list of fixtures (including the player of the match)
+    '''
+    html = '<html><body>'
+    for fixture in fixtures:
+        home, away = fixture['teams']
+        motm = fixture['lineups'][home][int(fixture['stats'][home][0][0]) % 23]
+        html += (
+            '<div class="vevent summary">'
+            f'<table><tr><td>{fixture["day"]} {fixture["month"]} 2023<br/>20:00</td></tr></table>'
+            f'<table><tr style="vertical-align:top;font-weight:bold"><td><a>{home}</a></td><td>{fixture["score"]}</td><td><a>{away}</a></td></tr></table>'
+            '<table><tr><td><span class="location">Stadium</span><span class="attendee">Referee: <a>A Referee</a></span></td></tr></table>'
+            '</div>'
+            f'<table><tr><td><p><b>Player of the Match:</b><br/><a>{motm}</a></p></td></tr></table>'
+        )
+    return html + '</body></html>'
+
+# Names from each website, ready for matching
+def name_frames(fixtures, seed = 0):
+    '''
+        Purpose: To make the RWC & ESPN name tables (name, team & name_link) that uf.matching takes, for every player in the fixtures
+    '''
+    rng = np.random.default_rng(seed)
+    rwc = sorted(set([(name,team) for x in fixtures for team in x['teams'] for name in x['lineups'][team]]))
+    df_rwc = pd.DataFrame(rwc,columns=['name_rwc','team'])
+    df_espn = pd.DataFrame({'name_espn':[perturb_name(x,rng) for x in df_rwc.name_rwc],'team':df_rwc.team})
+    df_rwc['name_link'] = [f'{x[0]}. {x.split(" ",1)[1]}'.lower() for x in df_rwc.name_rwc]
+    df_espn['name_link'] = [f'{x[0]}. {x.split(" ",1)[1]}'.lower() for x in df_espn.name_espn]
+    return df_rwc, df_espn.sample(frac=1,random_state=seed).reset_index(drop=True)
+
+# Combined player dataset, ready for scoring
+def player_data(fixtures):
+    '''
+        Purpose: To make a dataset shaped like player_data (one row per player-match) for the fixtures
+    '''
+    stats = ['breakdown_steals','lineout_steal','try','try_assist','conversion','penalty','drop_goal',
+             'defenders_beaten','meters_made','tackles','penalties_conceded','yellow_card','red_card','motm']
+    rows = []
+    for x in fixtures:
+        for team, opposition in zip(x['teams'],reversed(x['teams'])):
+            for n, name in enumerate(x['lineups'][team]):
+                rows.append([f'2023-{months.index(x["month"])+9}-{x["day"]}',team,opposition,name,n+1] + list(x['stats'][team][n][:len(stats)]))
+    df = pd.DataFrame(rows,columns=['date','team','opposition','name','no.'] + stats)
+    df['date'] = pd.to_datetime(df.date)
+    df['meters_made'] = df.meters_made * 10
+    return df
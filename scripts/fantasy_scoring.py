@@ -0,0 +1,147 @@
+'''
+    Filename: fantasy_scoring.py
+    Purpose: Score player stats against a fantasy points system, keeping the stats as a numeric matrix (player-matches x stats).
+'''
+
+##################################################################################################################################
+''' Importing packages '''
+##################################################################################################################################
+# Import packages
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Stats only scored per so many units, e.g. 1 point per 10 meters made
+per_units = {
+    'meters_made' : 10,
+}
+
+# Pull the stats out of a dataset
+def stat_matrix(dataset, stats, per = per_units):
+    '''
+        Purpose: To pull the stat columns out of a dataset as a numeric matrix, with one row per player-match and one column per stat
+        Inputs:
+            - dataset = Dataset of player stats
+            - stats = List of the stats to pull out. Stats missing from the dataset are left as 0
+            - per = Dictionary of stats only scored per so many units (these are divided by the units and rounded down)
+        Assumptions: Stats are whole numbers, so any decimals are dropped and '-' (no stat recorded) counts as 0
+    '''
+    X = np.zeros((len(dataset),len(stats)))
+    for j, stat in enumerate(stats):
+        if stat not in dataset.columns:
+            continue
+        values = dataset[stat]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = values.astype('string').replace('-','0')
+        X[:,j] = np.trunc(pd.to_numeric(values,errors='coerce').fillna(0).to_numpy(dtype=float))
+
+    # Scale the stats scored per so many units
+    units = np.array([per.get(x,1) for x in stats], dtype=float)
+    return np.floor(X / units) if (units != 1).any() else X
+
+# Turn a points system into weights
+def weight_vector(scoring, stats):
+    '''
+        Purpose: To turn a points system (dictionary of stat to points) into a vector of weights lined up with the stats
+    '''
+    return np.array([scoring.get(x,0) for x in stats], dtype=float)
+
+# Score a dataset
+def score(dataset, scoring, keys, per = per_units):
+    '''
+        Purpose: To apply a points system to a dataset of player stats
+        Inputs:
+            - dataset = Dataset of player stats, one row per player-match
+            - scoring = Dictionary of stat to points
+            - keys = Columns identifying each player-match
+            - per = Dictionary of stats only scored per so many units
+        Output: The keys, the total points, then the points from each stat in the points system
+    '''
+    # Points from each stat & in total
+    stats = list(scoring)
+    X = stat_matrix(dataset,stats,per)
+    w = weight_vector(scoring,stats)
+    points = X * w
+    total = X @ w
+
+    # Output
+    df = pd.concat([
+        dataset[keys].reset_index(drop=True),
+        pd.DataFrame({'total':total}),
+        pd.DataFrame(points,columns=stats),
+    ],axis=1)
+    return df.sort_values(keys).reset_index(drop=True)
+
+# Load many points systems
+def load_rulesets(path):
+    '''
+        Purpose: To load every points system saved in a directory
+        Inputs:
+            - path = Directory of json or yaml files, each one a dictionary of stat to points
+        Output: Dictionary of rule set name (the file name without its extension) to points system
+    '''
+    rulesets = {}
+    for file in sorted(Path(path).iterdir()):
+        if file.suffix == '.json':
+            with open(file) as f:
+                rulesets[file.stem] = json.load(f)
+        elif file.suffix in ['.yaml','.yml']:
+            import yaml # Only needed if there are yaml files
+            with open(file) as f:
+                rulesets[file.stem] = yaml.safe_load(f)
+    return rulesets
+
+# Turn many points systems into weights
+def weight_matrix(rulesets, stats):
+    '''
+        Purpose: To turn a dictionary of points systems into a matrix of weights, with one row per stat and one column per rule set
+    '''
+    return np.column_stack([weight_vector(scoring,stats) for scoring in rulesets.values()])
+
+# Score a dataset against many points systems at once
+def score_rulesets(dataset, rulesets, keys, per = per_units):
+    '''
+        Purpose: To apply many points systems to a dataset of player stats in one go
+        Inputs:
+            - dataset = Dataset of player stats, one row per player-match
+            - rulesets = Dictionary of rule set name to points system (see load_rulesets)
+            - keys = Columns identifying each player-match
+            - per = Dictionary of stats only scored per so many units
+        Output: The keys, then the total points under each rule set (one column per rule set)
+    '''
+    # Every stat used by any of the rule sets
+    stats = list(dict.fromkeys([x for scoring in rulesets.values() for x in scoring]))
+
+    # One matrix product scores every player-match under every rule set
+    totals = stat_matrix(dataset,stats,per) @ weight_matrix(rulesets,stats)
+
+    # Output
+    df = pd.concat([
+        dataset[keys].reset_index(drop=True),
+        pd.DataFrame(totals,columns=list(rulesets)),
+    ],axis=1)
+    return df.sort_values(keys).reset_index(drop=True)
+
+# Rank the players under each points system
+def rank_rulesets(totals, rulesets, player = ['name','team']):
+    '''
+        Purpose: To total up each player's points under each rule set and rank the players
+        Inputs:
+            - totals = Output of score_rulesets
+            - rulesets = Dictionary of rule set name to points system
+            - player = Columns identifying each player
+        Output: One row per rule set & player with their total points and rank (1 = most points)
+    '''
+    names = list(rulesets)
+    summary = totals.groupby(player,observed=True)[names].sum()
+    ranks = summary.rank(ascending=False,method='min')
+    df = pd.concat([
+        summary.reset_index().melt(id_vars=player,var_name='ruleset',value_name='total'),
+        ranks.reset_index().melt(id_vars=player,var_name='ruleset',value_name='rank')[['rank']],
+    ],axis=1)
+    return df.sort_values(['ruleset','rank']+player).reset_index(drop=True)
@@ -0,0 +1,163 @@
+'''
+    Filename: metrics.py
+    Purpose: Record how long each stage of the pipeline takes & what it uses (fetch, click & parse times, rows produced, driver relaunches,
+             peak memory), then save them as json and print a summary table at the end of each run.
+'''
+
+##################################################################################################################################
+''' Importing packages '''
+##################################################################################################################################
+# Import packages
+import os, sys, json, time, threading
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime
+
+# Peak memory is read from the os, which isn't possible on windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Peak memory used so far
+def peak_rss(who = 'self'):
+    '''
+        Purpose: To get the peak resident memory (in MB) used so far by this process ('self') or its finished child processes ('children')
+    '''
+    if resource == None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN).ru_maxrss
+    # Reported in bytes on mac & kilobytes on linux
+    return round(usage / (1024**2 if sys.platform == 'darwin' else 1024), 1)
+
+# Run a function & time it
+def run_timed(func, *args):
+    '''
+        Purpose: To run a function and time it, e.g. in another process where the recorder can't be reached
+        Output: The function's output, seconds taken
+    '''
+    start = time.perf_counter()
+    out = func(*args)
+    return out, time.perf_counter() - start
+
+# Metrics recorder
+class Metrics:
+    '''
+        Purpose: To record the timings, counts & memory use of a run. Safe to use from several threads at once
+        Inputs:
+            - name = Name of the run (defaults to the script being ran)
+    '''
+    def __init__(self, name = None):
+        self.name = name if name != None else os.path.basename(sys.argv[0])
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.stages = []
+        self.timings = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    # Time a stage of the run
+    @contextmanager
+    def stage(self, name):
+        '''
+            Purpose: To time a stage of the run, along with the peak memory reached by the end of it
+            Output: Dictionary the stage's details are saved in, so extras (e.g. rows) can be added to it
+        '''
+        details = {'stage' : name}
+        start = time.perf_counter()
+        try:
+            yield details
+        finally:
+            details['seconds'] = round(time.perf_counter() - start, 3)
+            details['peak_rss_mb'] = peak_rss('self')
+            details['peak_rss_children_mb'] = peak_rss('children')
+            with self.lock:
+                self.stages.append(details)
+
+    # Time a single step, e.g. fetching a url
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, **labels)
+
+    # Save a timing
+    def record(self, name, seconds, **labels):
+        with self.lock:
+            self.timings.setdefault(name,[]).append({'seconds':round(seconds,4), **labels})
+
+    # Save the timings sent back by run_timed
+    def collect(self, outputs, name, **labels):
+        '''
+            Purpose: To record the timings of a stream of (output, seconds) sent back by run_timed, passing the outputs on
+        '''
+        for out, seconds in outputs:
+            self.record(name, seconds, rows=len(out) if hasattr(out,'__len__') else None, **labels)
+            yield out
+
+    # Run a stage of the run
+    def run_stage(self, func, *args):
+        '''
+            Purpose: To run a function as a stage of the run, recording the number of rows it outputs (if any)
+        '''
+        with self.stage(func.__name__) as details:
+            out = func(*args)
+            details['rows'] = len(out) if hasattr(out,'__len__') else None
+        return out
+
+    # Add to a counter, e.g. the number of driver relaunches
+    def count(self, name, n = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name,0) + n
+
+    # Summarise the timings
+    def summary(self):
+        '''
+            Purpose: To summarise each timing (count, total, mean, median, 95th percentile & max seconds)
+        '''
+        rows = []
+        for name, samples in self.timings.items():
+            seconds = np.array([x['seconds'] for x in samples])
+            rows.append([name, len(seconds), seconds.sum(), seconds.mean(), np.percentile(seconds,50), np.percentile(seconds,95), seconds.max()])
+        return pd.DataFrame(rows,columns=['timing','count','total','mean','p50','p95','max']).round(3)
+
+    # Save the metrics
+    def save(self, path):
+        '''
+            Purpose: To save the metrics as json, with the summary of each timing followed by every sample
+        '''
+        summary = self.summary().set_index('timing')
+        out = {
+            'name' : self.name,
+            'started' : self.started,
+            'stages' : self.stages,
+            'counters' : self.counters,
+            'timings' : {x : {**{k : float(v) for k, v in summary.loc[x].items()}, 'samples' : self.timings[x]} for x in self.timings},
+        }
+        with open(f'{path}.tmp','w') as f:
+            json.dump(out,f,indent=4)
+        os.replace(f'{path}.tmp', path)
+
+    # Print the metrics
+    def report(self):
+        '''
+            Purpose: To print summary tables of the stages, timings & counters
+        '''
+        print(f'\nMetrics - {self.name}')
+        if len(self.stages) > 0:
+            print(pd.DataFrame(self.stages).to_string(index=False))
+        if len(self.timings) > 0:
+            print('')
+            print(self.summary().to_string(index=False))
+        for name, n in self.counters.items():
+            print(f'    - {name}: {n}')
+
+
+# Recorder shared by the scripts & useful functions
+recorder = Metrics()
@@ -0,0 +1,190 @@
+'''
+    Filename: parsing.py
+    Purpose: To parse the pages scraped from the RWC website, ESPN & Wikipedia into datasets. Kept apart from the scrapers (and free of
+             anything done on import, e.g. loading a tournament's config or creating directories) so the scraped pages can be parsed,
+             and the parsers benchmarked, without chrome, selenium or a tournament to scrape.
+'''
+
+##################################################################################################################################
+''' Importing packages and fixing pathway '''
+##################################################################################################################################
+# Import packages
+import os, sys
+from bs4 import BeautifulSoup
+
+# Fix pathway
+module_path = os.path.abspath(os.path.join(''))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# Import functions
+import scripts.useful_functions as uf
+
+
+##################################################################################################################################
+''' Useful variables '''
+##################################################################################################################################
+# Stat tabs clicked through on each website, unless a tournament's config says otherwise
+rwc_stat_options = ['General','Attack','Defence']
+espn_stat_options = ['Scoring','Attacking','Defending','Discipline']
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Turn scraped html into beautiful soup
+def make_soup(htmls, click = None):
+    '''
+        Purpose: To parse the html scraped for one url into the output shape of web_scrape
+        Output: The page's soup, or [soup, pages] if there were buttons clicked
+    '''
+    soup = BeautifulSoup(htmls[0], 'html.parser')
+    if click == None:
+        return soup
+    return [soup,[BeautifulSoup(html, 'html.parser') for html in htmls[1:]]]
+
+# https://www.rugbyworldcup.com match centre
+def parse_rwc_fixture(htmls, stat_options = rwc_stat_options):
+    '''
+        Purpose: To extract the player stats from the scraped html of one RWC match centre
+        Inputs:
+            - htmls = List of the match centre's html followed by the html after clicking each stat tab
+            - stat_options = List of the stat tabs clicked through, in order
+    '''
+    # Define objects
+    soup, pages = make_soup(htmls,stat_options)
+
+    # Find game details
+    date = soup.find('div',class_='date date--rwc2024 match-details__date')
+    date = '-'.join([date.find('span',class_=f'date__unit date__unit--{x}').get_text().replace('\n','').replace(',','').strip() for x in ['day-number','month','year']])
+    
+    # Find team names
+    teams = [x.get_text() for x in soup.find_all('div',class_='mc-lineups__team-name')][:2]
+    print(f'    - {teams[0]} vs {teams[1]}')
+    
+    # Find lineup
+    starters_and_subs = [
+        soup.find('div',class_='mc-lineups__team-lineups js-starters'),
+        soup.find('div',class_='mc-lineups__substitutes js-substitutes')
+    ]
+    cols = ['Date','Team','Opposition','No.','Player']
+    lineups = uf.RecordBuilder(cols)
+    for lineup in starters_and_subs:
+        for position in lineup.find_all('div',class_='mc-lineups__player-row'):
+            try:
+                num = position.find('div',class_='mc-lineups__player-number').get_text()
+            except AttributeError:
+                # Error on https://www.rugbyworldcup.com/2023/match/pool-b-ireland-tonga#stats
+                num = str(int(lineups.data[cols.index('No.')][-1])+1)
+            players = [x.get_text().strip() for x in position.find_all('div',class_='mc-lineups__player-name')]
+            for team, opposition, player in zip(teams,reversed(teams),players):
+                lineups.add([date,team,opposition,num,player])
+    df = lineups.to_frame()
+
+    # Loop through the different stat options
+    for stat_option, page in zip(stat_options,pages):        
+        # Locate section within Beautiful Soup
+        stat_box = page.find('div',{'data-ui-tab':stat_option})
+        
+        # Scrape the title of each column
+        stat_titles = stat_box.find_all('span',class_='mc-player-stats__header-cell-content')
+        stat_titles = [x.get_text().replace('\t','').replace('\n','').strip() for x in stat_titles]
+        stat_titles[3:] = [f'{stat_option}_{x}' for x in stat_titles[3:]]
+        
+        # Get the data by looping through each
+        stat_input = uf.RecordBuilder(stat_titles)
+        
+        # Loop through each team
+        for team in range(1,3,1):
+            players = stat_box.find_all('tr',class_=f'mc-player-stats__table-row mc-player-stats__table-row--team-{team}')
+            
+            # Loop through each player
+            for player in players:
+                stats = [x.get_text().strip() for x in player.find_all('td',class_='mc-player-stats__cell')]
+                stats[1] = teams[team-1]
+                stat_input.add(stats)
+        
+        # Add stats to main dataframe
+        df = df.merge(stat_input.to_frame(),on=['Team','No.','Player'])
+
+    # Output
+    return df
+
+# https://www.espn.co.uk/rugby match & playerstats pages
+def parse_espn_fixture(match_htmls, stat_htmls, stat_options = espn_stat_options):
+    '''
+        Purpose: To extract the player stats from the scraped html of one ESPN match
+        Inputs:
+            - match_htmls = List containing the html of the match details page
+            - stat_htmls = List of the playerstats page's html followed by the html after clicking each stat tab
+            - stat_options = List of the stat tabs clicked through, in order
+    '''
+    # Find match info
+    md = make_soup(match_htmls)
+    date = ' '.join(md.find('div',class_='col-two').find('article',class_='sub-module game-information').find('div',class_='game-date-time').get_text().split(', ')[1:])
+    teams = [x.get_text() for x in  md.find('div',class_='competitors').find_all('span',class_='long-name')]
+    print(f'    - {teams[0]} vs {teams[1]}')
+
+    # Loop through the different stat options (the playerstats page before any clicks isn't needed, so isn't parsed)
+    pages = [make_soup([x]) for x in stat_htmls[1:]]
+    for stat_option, page in zip(stat_options,pages):
+
+        # Locate section within Beautiful Soup
+        stat_boxes = page.find('div',class_='sub-module tabbedTable').find_all('table',class_='mod-data')
+
+        # Scrape the title of each column
+        cols = ['date','team','opposition','pos','name']
+        stat_titles = stat_boxes[0].find('tr',class_='header')
+        stat_titles = cols + [f'{stat_option}_{x.get_text().strip()}' for x in stat_titles.find_all('th')[1:]]
+
+        # Get the data by looping through each
+        stat_input = uf.RecordBuilder(stat_titles)
+        for team, opposition, stat_box in zip(teams,reversed(teams),stat_boxes):
+            players = stat_box.find('tbody').find_all('tr')
+            
+            # Loop through each player
+            for player in players:
+                stats = player.find_all('td')
+                stats = [date,team,opposition,stats[0].find('span').get_text(),stats[0].find('a').get_text()] + [x.get_text() for x in stats[1:]]
+                stat_input.add(stats)
+
+        # Add stats to main dataframe
+        stat_input = stat_input.to_frame()
+        df = stat_input if stat_option == stat_options[0] else df.merge(stat_input,on=cols)
+
+    # Output
+    return df
+
+# https://en.wikipedia.org pool & knockout pages
+def parse_wiki_page(htmls, year):
+    '''
+        Purpose: To extract the match details (including the motm) from the scraped html of one wikipedia page
+        Inputs:
+            - htmls = List containing the html of the wikipedia page
+            - year = Year of the matches (the pages only give the day & month)
+    '''
+    # Extract fixture information
+    soup = make_soup(htmls)
+    tables = [x for x in soup.find_all('table') if 'Player of the Match:' in x.get_text()]
+    summaries = soup.find_all('div',class_='vevent summary')
+    
+    # Loop through the summary section and the area tgat says who the motm is
+    dataset = uf.RecordBuilder(['date','team_home','score','team_away','location','referee','motm'])
+    for summary, table in zip(summaries,tables):
+        # Get summary details
+        match_details = summary.find_all('table')
+        result = match_details[1].find('tr',{'style':'vertical-align:top;font-weight:bold'}).find_all('td')
+
+        # Add to dataset  
+        dataset.add({
+            'date' : ' '.join(match_details[0].find('td').get_text().split(' ')[:2]+[str(year)]),
+            'team_home' : result[0].find('a').get_text(),
+            'score' : result[1].get_text(),
+            'team_away' : result[2].find('a').get_text(),
+            'location' : match_details[2].find('span',class_='location').get_text(),
+            'referee' : match_details[2].find('span',class_='attendee').find('a').get_text(),
+            'motm' : [x.find('a').get_text() for x in table.find_all('p') if x.find('b').get_text() == 'Player of the Match:'][0]
+        })
+
+    # Output
+    return dataset.to_frame()
@@ -0,0 +1,278 @@
+'''
+    Filename: pipeline.py
+    Purpose: Run the whole pipeline (scraping, name matching & scoring) from one place, for every tournament with a config. Each stage
+             declares the files it reads & writes, stages that don't depend on each other (including the same stage for different
+             tournaments) run at the same time, and a stage is skipped if its inputs & code haven't changed since it last ran.
+    Usage: python scripts/pipeline.py [stages...] [--tournaments rwc_2023] [--force] [--dry-run] [--jobs 3] [--replay] [--incremental]
+'''
+
+##################################################################################################################################
+''' Initialising script '''
+##################################################################################################################################
+# Import packages
+import os, sys, json, time, hashlib, argparse, subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Fixing pathway
+module_path = os.path.abspath(os.path.join(''))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# Import functions
+import scripts.tournaments as tournaments
+
+# Hashes of the inputs & code each stage last ran with
+state_path = f'{tournaments.data_root}pipeline_state.json'
+
+# Options
+parser = argparse.ArgumentParser(description='Run the pipeline, skipping the stages that are up to date')
+parser.add_argument('stages', nargs='*', help='Stages to run, e.g. scoring or rwc_2023/scoring (all of them if none are listed)')
+parser.add_argument('--tournaments', nargs='+', default=None, help='Tournaments to run for (all of them if none are listed)')
+parser.add_argument('--force', action='store_true', help='Run the stages even if they are up to date')
+parser.add_argument('--dry-run', action='store_true', help='Only print which stages would run')
+parser.add_argument('--jobs', type=int, default=3, help='Number of stages that can run at once')
+parser.add_argument('--replay', action='store_true', help='Only parse the cached pages when scraping (see data_scraping.py)')
+parser.add_argument('--incremental', action='store_true', help='Only scrape the fixtures that are not already in the datasets')
+
+
+
+##################################################################################################################################
+''' Stages '''
+##################################################################################################################################
+# Code shared by most of the stages
+shared_code = ['scripts/useful_functions.py','scripts/storage.py','scripts/schema.py','scripts/metrics.py']
+scraping_code = shared_code + ['scripts/web_scraping.py','scripts/parsing.py','scripts/rwc_2023/data_scraping.py']
+
+# Sections of a tournament's config read by every stage (to find where its data is kept)
+shared_settings = ['tournament','season']
+
+# Sections of a tournament's config a stage reads
+def settings(config, sections):
+    return {x : config.get(x) for x in shared_settings + sections}
+
+# Each stage's script, the code it runs & the files it reads and writes, for a tournament
+def tournament_stages(name):
+    '''
+        Purpose: To define the stages of a tournament (only scraping the websites in its config), named {tournament}/{stage}
+        Assumptions:
+            - Scraping has no input files, so it's only reran when its code or settings change, its outputs are missing or it's forced
+            - A stage depends on any other stage that writes one of its inputs
+            - A stage is only hashed with the sections of the config it reads (its settings), so e.g. changing the squad's team cap doesn't
+              rerun the scrapes
+    '''
+    config = tournaments.load_config(name)
+    filepath = tournaments.partition_path(config)
+    code = ['scripts/tournaments.py']
+    datasets = {'rwc' : 'player_data_rwc', 'espn' : 'player_data_espn', 'wiki' : 'match_data_wiki'}
+    stages = {}
+    for website, dataset in datasets.items():
+        if website in config:
+            stages[f'{name}/scrape_{website}'] = {
+                'script' : ['scripts/rwc_2023/data_scraping.py',website,f'--tournament={name}'],
+                'code' : scraping_code + code,
+                'settings' : settings(config,[website]),
+                'inputs' : [],
+                'outputs' : [f'{filepath}{dataset}.parquet'],
+                'log' : f'{filepath}logs/scrape_{website}.log',
+            }
+    stages[f'{name}/name_matchup'] = {
+        'script' : ['scripts/rwc_2023/player_name_matchup.py',f'--tournament={name}'],
+        'code' : shared_code + code + ['scripts/rwc_2023/player_name_matchup.py',config['name_fixes']],
+        'settings' : settings(config,['name_fixes']),
+        'inputs' : [f'{filepath}{x}.parquet' for x in datasets.values()],
+        'outputs' : [f'{filepath}player_lookup.parquet',f'{filepath}player_aliases.csv'],
+        'log' : f'{filepath}logs/name_matchup.log',
+    }
+    stages[f'{name}/scoring'] = {
+        'script' : ['scripts/rwc_2023/player_scoring.py',f'--tournament={name}'],
+        'code' : shared_code + code + ['scripts/rwc_2023/player_scoring.py','scripts/fantasy_scoring.py','scripts/squad_optimizer.py','scripts/stat_store.py','scripts/projection.py',config['rulesets'],config['prices']],
+        'settings' : settings(config,['scoring','squad','projection','rulesets','prices']),
+        'inputs' : [f'{filepath}player_lookup.parquet'] + [f'{filepath}{x}.parquet' for x in datasets.values()],
+        'outputs' : [f'{filepath}player_data.parquet',f'{filepath}fantasy_scores.parquet',f'{filepath}fantasy_squads.parquet',f'{filepath}fantasy_projections.parquet'],
+        'log' : f'{filepath}logs/scoring.log',
+    }
+    return stages
+
+# Stages of every tournament
+def all_stages(names = None):
+    names = tournaments.list_tournaments() if names == None else names
+    return {x : y for name in names for x, y in tournament_stages(name).items()}
+
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Files making up a path
+def list_files(path):
+    '''
+        Purpose: To list the files in a path (the path itself if it's a file, or every file within it if it's a directory)
+    '''
+    path = Path(path)
+    if not path.exists():
+        return []
+    if path.is_dir():
+        return sorted([x for x in path.rglob('*') if x.is_file() and '__pycache__' not in x.parts])
+    return [path]
+
+# Hash a stage
+def stage_hash(stage, extra = []):
+    '''
+        Purpose: To hash the contents of a stage's code & inputs (and the arguments & settings it's ran with), so it can be skipped if nothing has changed
+        Assumptions: Missing files are hashed as missing, so a stage reruns once they appear
+    '''
+    digest = hashlib.sha256(json.dumps(stage['script'] + extra).encode('utf-8'))
+    digest.update(json.dumps(stage.get('settings',{}), sort_keys=True).encode('utf-8'))
+    for path in stage['code'] + stage['inputs']:
+        for file in list_files(path):
+            digest.update(str(file).encode('utf-8'))
+            if file.exists():
+                with open(file,'rb') as f:
+                    for chunk in iter(lambda: f.read(1024**2), b''):
+                        digest.update(chunk)
+            else:
+                digest.update(b'missing')
+    return digest.hexdigest()
+
+# Stages each stage depends on
+def dependencies(stages):
+    '''
+        Purpose: To find the stages each stage depends on, i.e. the ones that write its inputs
+    '''
+    writers = {output : name for name, stage in stages.items() for output in stage['outputs']}
+    return {name : set([writers[x] for x in stage['inputs'] if x in writers and writers[x] != name]) for name, stage in stages.items()}
+
+# Order the stages
+def stage_order(stages):
+    '''
+        Purpose: To order the stages so each one comes after the stages it depends on
+    '''
+    deps = dependencies(stages)
+    order = []
+    while len(order) < len(stages):
+        ready = [x for x in stages if x not in order and deps[x].issubset(order)]
+        if len(ready) == 0:
+            raise ValueError(f"The stages depend on each other in a loop: {', '.join([x for x in stages if x not in order])}")
+        order = order + ready
+    return order
+
+# Check if a stage needs running
+def needs_running(name, stage, state, extra = [], force = False):
+    '''
+        Output: Whether the stage needs running, the stage's current hash
+    '''
+    current = stage_hash(stage,extra)
+    missing = any([not os.path.exists(x) for x in stage['outputs']])
+    return force or missing or state.get(name) != current, current
+
+# Run a stage
+def run_stage(name, stage, extra = []):
+    '''
+        Purpose: To run a stage's script from the repo's root, saving what it prints to a log file
+        Output: The script's return code, seconds taken
+    '''
+    Path(stage['log']).parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    with open(stage['log'],'w') as log:
+        code = subprocess.run([sys.executable] + stage['script'] + extra, stdout=log, stderr=subprocess.STDOUT).returncode
+    return code, time.perf_counter() - start
+
+# Run the pipeline
+def run_pipeline(chosen = None, names = None, force = False, dry_run = False, jobs = 3, extra = []):
+    '''
+        Purpose: To run the chosen stages in dependency order, running independent stages at the same time and skipping the ones that are up to date
+        Inputs:
+            - chosen = List of the stages to run, either for every tournament (e.g. 'scoring') or one (e.g. 'rwc_2023/scoring'). If not specified, all of them
+            - names = List of the tournaments to run for. If not specified, all of them
+            - force = Run the stages even if they're up to date
+            - dry_run = Only print which stages would run
+            - jobs = Number of stages that can run at once
+            - extra = Arguments passed on to the scraping stages (e.g. --replay)
+        Assumptions: A stage only starts once every stage it depends on has finished. If a stage fails, the stages depending on it don't run
+    '''
+    # Check the stages
+    stages = all_stages(names)
+    kinds = set([x.split('/')[1] for x in stages])
+    chosen = list(stages) if chosen == None or len(chosen) == 0 else chosen
+    if any([x not in stages and x not in kinds for x in chosen]):
+        raise ValueError(f"Stages must be from the following options: {', '.join(sorted(kinds) + list(stages))}")
+    chosen = [x for x in stage_order(stages) if x in chosen or x.split('/')[1] in chosen]
+    deps = {x : y.intersection(chosen) for x, y in dependencies(stages).items() if x in chosen}
+    args = {x : extra if x.split('/')[1].startswith('scrape') else [] for x in chosen}
+
+    # Load the hashes from the last run
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    # Only print what would run. Stages downstream of one that would run are assumed to run too
+    if dry_run:
+        running = set()
+        for x in chosen:
+            run, _ = needs_running(x,stages[x],state,args[x],force)
+            run = run or len(deps[x].intersection(running)) > 0
+            running = running.union([x]) if run else running
+            print(f'    - {x}: {"run" if run else "up to date"}')
+        return
+
+    # Start each stage once the stages it depends on are done
+    done, failed, pending, hashes = set(), set(), {}, {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while len(done) + len(failed) < len(chosen):
+            for x in chosen:
+                if x in done or x in failed or x in pending.values() or not deps[x].issubset(done.union(failed)):
+                    continue
+
+                # Don't run stages that depend on a failed stage
+                if len(deps[x].intersection(failed)) > 0:
+                    print(f'    - {x}: not ran, depends on a failed stage')
+                    failed.add(x)
+                    continue
+
+                # Skip the stage if nothing has changed
+                run, current = needs_running(x,stages[x],state,args[x],force)
+                if not run:
+                    print(f'    - {x}: up to date')
+                    done.add(x)
+                    continue
+                print(f'    - {x}: running')
+                pending[pool.submit(run_stage,x,stages[x],args[x])] = x
+                hashes[x] = current
+
+            # Wait for a stage to finish
+            if len(pending) == 0:
+                continue
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in finished:
+                x = pending.pop(future)
+                code, seconds = future.result()
+                if code != 0:
+                    print(f'    - {x}: failed after {seconds:.1f}s, see {stages[x]["log"]}')
+                    failed.add(x)
+                    continue
+
+                # Save the hash the stage ran with
+                state[x] = hashes[x]
+                Path(state_path).parent.mkdir(parents=True, exist_ok=True)
+                with open(f'{state_path}.tmp','w') as f:
+                    json.dump(state,f,indent=4)
+                os.replace(f'{state_path}.tmp', state_path)
+                print(f'    - {x}: finished in {seconds:.1f}s')
+                done.add(x)
+
+    # Output
+    if len(failed) > 0:
+        raise RuntimeError(f"Stages failed: {', '.join([x for x in chosen if x in failed])}")
+
+
+
+##################################################################################################################################
+''' Run the pipeline '''
+##################################################################################################################################
+if __name__ == '__main__':
+    args = parser.parse_args()
+    extra = [x for x, on in [('--replay',args.replay),('--incremental',args.incremental)] if on]
+    print('Running the pipeline')
+    run_pipeline(args.stages,args.tournaments,args.force,args.dry_run,args.jobs,extra)
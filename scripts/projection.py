@@ -0,0 +1,187 @@
+'''
+    Filename: projection.py
+    Purpose: Project each player's fantasy points for their next match, with the spread around it, by Monte Carlo simulation. Each simulated
+             match draws every stat from the player's own history (player_data), and the draws of every player, simulation & stat are
+             scored in one batched matrix product against the points systems' weights. Players are simulated in blocks, which are shared
+             between processes for the bigger runs.
+    Usage:
+        projection.project(dataset, {'default' : scoring}, sims=100000)
+'''
+
+##################################################################################################################################
+''' Importing packages and fixing pathway '''
+##################################################################################################################################
+# Import packages
+import os, sys
+import numpy as np
+
+# Fix pathway
+module_path = os.path.abspath(os.path.join(''))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# Import functions
+import scripts.useful_functions as uf
+import scripts.fantasy_scoring as fs
+
+
+##################################################################################################################################
+''' Useful variables '''
+##################################################################################################################################
+# Percentiles of each player's simulated points that are outputted
+default_percentiles = [5,25,50,75,95]
+
+# Number of simulations drawn at a time, so the draws of a block of players stay small in memory
+sims_chunk = 8192
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Each player's stats in every match they've played
+def histories(dataset, stats, player = ['name','team'], last = None, per = fs.per_units):
+    '''
+        Purpose: To line up each player's stats from every match as one matrix, with each player's matches next to each other
+        Inputs:
+            - dataset = Dataset of player stats, one row per player-match (e.g. player_data)
+            - stats = List of the stats to pull out (see fantasy_scoring.stat_matrix)
+            - player = Columns identifying each player
+            - last = Only keep each player's last so many matches (by date). If not specified, every match is kept
+            - per = Dictionary of stats only scored per so many units
+        Output: The players, the matrix of stats (player-matches x stats), where each player's matches start in the matrix & how many they have
+    '''
+    df = dataset.sort_values(player + (['date'] if 'date' in dataset.columns else []), kind='stable')
+    if last != None:
+        df = df.groupby(player,observed=True).tail(last)
+    sizes = df.groupby(player,observed=True,sort=False).size()
+    counts = sizes.to_numpy()
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return sizes.index.to_frame(index=False), fs.stat_matrix(df,stats,per).astype(np.float32), offsets, counts
+
+# Simulate a block of players
+def simulate_block(history, offsets, counts, weights, sims, seed, percentiles = default_percentiles, method = 'stats'):
+    '''
+        Purpose: To simulate the points of a block of players over many matches
+        Inputs:
+            - history = Matrix of the block's stats (player-matches x stats), each player's matches next to each other (see histories)
+            - offsets = Where each player's matches start in the matrix
+            - counts = Number of matches each player has
+            - weights = Matrix of the points of each stat (stats x points systems)
+            - sims = Number of matches to simulate
+            - seed = Seed of the block's random numbers
+            - percentiles = List of the percentiles of each player's points to output
+            - method = How each simulated match is drawn, see project
+        Output: Mean, standard deviation & percentiles of each player's points, as arrays of (players x points systems), with the percentiles
+                first
+    '''
+    rng = np.random.default_rng(seed)
+    n = len(counts)
+
+    # Stats that are the same in every one of a player's matches add the same points to every simulation, so only the others are drawn
+    varies = (np.maximum.reduceat(history,offsets,axis=0) != np.minimum.reduceat(history,offsets,axis=0)).any(axis=0)
+    fixed = history[offsets][:,~varies] @ weights[~varies]
+    history, weights = history[:,varies], weights[varies].astype(np.float32)
+    k, n_rulesets = history.shape[1], weights.shape[1]
+
+    # Drawing whole matches only needs each match's points, so the matches are scored up front and one match is drawn per simulation
+    if method == 'matches':
+        history, k = history @ weights, min(k,1)
+
+    # Each stat's column of the history, so the draws of each stat are taken from one contiguous array
+    columns = np.ascontiguousarray(history.T)
+
+    # Matches are drawn from random 16 bit numbers scaled to each player's number of matches, keeping the top bits of the product (Lemire's
+    # method). The few draws whose bottom bits fall under 2**bits % matches would pick some matches more often than others, so they're redrawn.
+    # Redraws are rarer the more bits there are, so 32 bit numbers are used if any player in the block has over 256 matches
+    bits, dtype = (16, np.uint32) if counts.max() <= 256 else (32, np.int64)
+    draw_dtype, mask = (np.uint16 if bits == 16 else np.uint32), dtype(2**bits - 1)
+    threshold = (2**bits % counts).astype(dtype)
+    offsets, counts = offsets.astype(dtype)[:,None], counts.astype(dtype)[:,None]
+    totals = np.empty((n_rulesets,n,sims), dtype=np.float32)
+    totals[:] = fixed.T[:,:,None]
+    for start in range(0, sims if k > 0 else 0, sims_chunk):
+        m = min(sims_chunk, sims-start)
+        draws = rng.integers(0, 2**bits, (k,n,m), dtype=draw_dtype).astype(dtype)
+        draws *= counts
+
+        # Redraw the draws that would bias the matches picked, until none are left
+        flat = draws.reshape(-1)
+        redraw = np.flatnonzero((draws & mask) < threshold[:,None])
+        while len(redraw) > 0:
+            player = (redraw // m) % n
+            flat[redraw] = rng.integers(0, 2**bits, len(redraw), dtype=draw_dtype).astype(dtype) * counts[player,0]
+            redraw = redraw[(flat[redraw] & mask) < threshold[player]]
+        draws >>= bits
+        draws += offsets
+
+        # Score every draw of every player, simulation & stat in one product (the matches drawn whole are already scored)
+        if method == 'matches':
+            totals[:,:,start:start+m] += columns[:,draws[0]]
+        else:
+            X = np.empty((k,n,m), dtype=np.float32)
+            for j in range(k):
+                columns[j].take(draws[j], out=X[j])
+            totals[:,:,start:start+m] += (weights.T @ X.reshape(k,-1)).reshape(n_rulesets,n,m)
+
+    # Output
+    return totals.mean(axis=2,dtype=np.float64).T, totals.std(axis=2,dtype=np.float64).T, np.percentile(totals, percentiles, axis=2).transpose(0,2,1).astype(np.float64)
+
+# Project each player's points
+def project(dataset, rulesets, sims = 100000, percentiles = default_percentiles, method = 'stats', player = ['name','team'], teams = None,
+            last = None, min_matches = 1, block = 32, processes = None, seed = 0, per = fs.per_units):
+    '''
+        Purpose: To project each player's points in their next match under each points system, by simulating it many times from their history
+        Inputs:
+            - dataset = Dataset of player stats, one row per player-match (e.g. player_data)
+            - rulesets = Dictionary of rule set name to points system (see fantasy_scoring.load_rulesets)
+            - sims = Number of matches to simulate for each player
+            - percentiles = List of the percentiles of each player's points to output
+            - method = How each simulated match is drawn, options are:
+                - 'stats' (default) = Each stat is drawn from a different one of the player's matches, so the spread comes from each stat's own
+                                      distribution.
+                - 'matches' = Every stat is drawn from the same match, keeping the stats that go together (e.g. tries & meters made) together.
+            - player = Columns identifying each player
+            - teams = List of the teams to project (e.g. the teams playing in the next round). If not specified, every team
+            - last = Only draw from each player's last so many matches. If not specified, every match
+            - min_matches = Least number of matches a player needs to be projected
+            - block = Number of players simulated together
+            - processes = Number of processes to share the blocks between (see useful_functions.parallel_map). If not specified, one per cpu
+            - seed = Seed of the random numbers. The same seed & block give the same projections whatever the number of processes
+            - per = Dictionary of stats only scored per so many units
+        Output: One row per rule set & player with the number of matches drawn from, then the mean, standard deviation & percentiles
+                (p5, p25...) of their points, the players with the most points first
+    '''
+    # Check inputs
+    method_options = ['stats','matches']
+    if method_options.count(method) != 1:
+        raise ValueError(f"'method' input must be one of the following options: {', '.join(method_options)}")
+
+    # Each player's history & the weights of every stat used by any of the rule sets
+    stats = list(dict.fromkeys([x for scoring in rulesets.values() for x in scoring]))
+    weights = fs.weight_matrix(rulesets,stats)
+    if teams != None:
+        dataset = dataset[dataset.team.isin(teams)]
+    players, history, offsets, counts = histories(dataset,stats,player,last,per)
+    keep = np.flatnonzero(counts >= min_matches)
+
+    # Simulate each block of players (each with its own seed, so the blocks can be simulated anywhere)
+    blocks = [keep[i:i+block] for i in range(0, len(keep), block)]
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+    inputs = []
+    for rows, block_seed in zip(blocks, seeds):
+        matches = np.concatenate([np.arange(offsets[x], offsets[x]+counts[x]) for x in rows])
+        block_offsets = np.concatenate([[0], np.cumsum(counts[rows])[:-1]])
+        inputs.append([history[matches], block_offsets, counts[rows], weights, sims, block_seed, percentiles, method])
+    results = uf.parallel_map(simulate_block,inputs,processes)
+
+    # Output
+    n_rulesets = len(rulesets)
+    mean = np.concatenate([x[0] for x in results]) if len(results) > 0 else np.empty((0,n_rulesets))
+    std = np.concatenate([x[1] for x in results]) if len(results) > 0 else np.empty((0,n_rulesets))
+    quantiles = np.concatenate([x[2] for x in results], axis=1) if len(results) > 0 else np.empty((len(percentiles),0,n_rulesets))
+    players = players.iloc[keep].reset_index(drop=True)
+    df = uf.concat_frames([
+        players.assign(ruleset=name, matches=counts[keep], mean=mean[:,r], std=std[:,r], **{f'p{q:g}' : quantiles[i,:,r] for i, q in enumerate(percentiles)})
+        for r, name in enumerate(rulesets)
+    ])
+    return df.sort_values(['ruleset','mean'],ascending=[True,False],kind='stable').reset_index(drop=True) if len(df) > 0 else df
@@ -1,6 +1,7 @@
 '''
     Filename: data_scraping.py
-    Purpose: To scrape the RWC 2023 data from the following websites: RWC 2023 website, ESPN & Wikipedia.
+    Purpose: To scrape a tournament's data from the following websites: RWC website, ESPN & Wikipedia.
+    Usage: python scripts/rwc_2023/data_scraping.py [rwc] [espn] [wiki] [--tournament=rwc_2023] [--replay] [--incremental] [--restart]
 '''
 
 ##################################################################################################################################
@@ -16,271 +17,234 @@ module_path = os.path.abspath(os.path.join(''))
 if module_path not in sys.path:
     sys.path.append(module_path)
 
+# Import functinos
+import scripts.useful_functions as uf
+import scripts.web_scraping as ws
+import scripts.parsing as parsing
+import scripts.storage as storage
+import scripts.metrics as metrics
+import scripts.tournaments as tournaments
+
+# Tournament to scrape (run with --tournament=<name> to choose, see scripts/tournaments.py)
+config = tournaments.load_config(tournaments.from_argv())
+
 # Output Directory
-filepath = 'data/rwc_2023/'
+filepath = tournaments.partition_path(config)
 Path(filepath).mkdir(parents=True, exist_ok=True)
 
-# Import functinos
-import scripts.useful_functions as uf
+# Number of chrome drivers to scrape with at once
+pool_size = 4
+
+# Number of processes to parse the scraped pages with
+processes = os.cpu_count()
+
+# Cache the scraped pages (run with --replay to only parse the cached pages, without scraping anything)
+cache = ws.PageCache(
+    f'{filepath}page_cache/',
+    ttl = 24*60*60,
+    max_size = 2*1024**3,
+    mode = 'replay' if '--replay' in sys.argv else 'use'
+)
+
+# Run with --incremental to only scrape the fixtures that aren't already in the datasets
+incremental = '--incremental' in sys.argv
+
+# Each parsed fixture is checkpointed, so a run that's interrupted carries on where it stopped (run with --restart to discard the checkpoints)
+restart = '--restart' in sys.argv
+
+# Fixtures that are never scraped
+rwc_excluded = config.get('rwc',{}).get('excluded',{})
+
+
+
+##################################################################################################################################
+''' Functions to parse each fixture '''
+##################################################################################################################################
+# Stat tabs clicked through on each website
+rwc_stat_options = config.get('rwc',{}).get('stat_tabs',parsing.rwc_stat_options)
+espn_stat_options = config.get('espn',{}).get('stat_tabs',parsing.espn_stat_options)
+
+# https://www.rugbyworldcup.com match centre (see parsing.py)
+def parse_rwc_fixture(htmls):
+    return parsing.parse_rwc_fixture(htmls,rwc_stat_options)
+
+# https://www.espn.co.uk/rugby match & playerstats pages
+def parse_espn_fixture(match_htmls, stat_htmls):
+    return parsing.parse_espn_fixture(match_htmls,stat_htmls,espn_stat_options)
+
+# https://en.wikipedia.org pool & knockout pages
+def parse_wiki_page(htmls):
+    return parsing.parse_wiki_page(htmls,config['wiki']['year'])
 
 
 
 ##################################################################################################################################
 ''' Functions to scrape each website '''
 ##################################################################################################################################
+# Css selectors of the element holding each stat tab, so only that element is taken after each click rather than the whole page
+def tab_containers(website, stat_options):
+    selector = config[website].get('tab_container')
+    return [selector.format(x) for x in stat_options] if selector != None else None
+
+# Fast chrome profile, waiting explicitly for the elements in the website's config rather than implicitly for every element.
+# Fixtures that still fail after their retries are skipped (and left out of the manifest), so the rest of the run isn't lost
+def fast_profile(website):
+    return {'options' : ws.fast_options, 'blocked' : ws.blocked_resources, 'wait_for' : config[website].get('wait_for'), 'errors' : 'skip'}
+
+# Checkpoints of a website's parsed fixtures
+def load_checkpoint(website, fixtures):
+    '''
+        Purpose: To load the checkpoints of a website's fixtures from an interrupted run
+        Output: Checkpoint, list of the fixtures already parsed
+    '''
+    checkpoint = uf.Checkpoint(f'{filepath}checkpoints/{website}/')
+    if restart:
+        checkpoint.clear()
+    done = checkpoint.completed(fixtures)
+    if len(done) > 0:
+        print(f'Carrying on from {len(done)} checkpointed fixtures')
+    return checkpoint, done
+
+# Report the fixtures that couldn't be scraped
+def report_failed(fixtures, ingested):
+    failed = [x for x in fixtures if x not in ingested]
+    if len(failed) > 0:
+        print(f'{len(failed)} fixtures failed to scrape and are left out, run with --incremental to retry them:')
+        for x in failed:
+            print(f'    - {x}')
+
 # https://www.rugbyworldcup.com
-def scrape_rwc():
+def scrape_rwc(incremental = incremental):
     # Get fixtures
-    url = "https://www.rugbyworldcup.com/2023/matches"
-    print(f'\nStart scraping the RWC 2023 website')
-    soup = uf.web_scrape(url)
-    fixtures = soup.find_all('a',class_='button button--maintain-desktop button--match-centre')
+    url = config['rwc']['matches_url']
+    print(f'\nStart scraping the RWC website - {config["name"]}')
+    soup = ws.web_scrape(url,backend='http',cache=cache)
+    fixtures = soup.find_all('a',class_=config['rwc']['fixture_class'])
     fixtures = ['https:' + x['href'] + '#stats' for x in fixtures]
-    fixtures = [x for x in fixtures if '28791' not in x]
-    fixtures = [x for x in fixtures if '28797' not in x]
+
+    # Skip the fixtures excluded in the config (and the ones already ingested if running incrementally)
+    manifest_path = f'{filepath}manifest_rwc.json'
+    manifest = uf.load_manifest(manifest_path,rwc_excluded,'player_data_rwc',filepath)
+    manifest = manifest if incremental else {'ingested' : [], 'excluded' : manifest['excluded']}
+    fixtures = uf.new_fixtures(fixtures,manifest)
+    if len(fixtures) == 0:
+        print(f'No new fixtures to scrape - {url}\n')
+        return
 
     # Define objects and scrape website
-    stat_options = ['General','Attack','Defence']
-    xpaths = [f'/html/body/main/div/div[3]/div[2]/div[3]/div[4]/div[2]/div[2]/div/div[2]/div[1]/ul/li[{x+1}]' for x in range(len(stat_options))]
-    scraped_urls = uf.web_scrape(fixtures[:20],xpaths)
-    scraped_urls = scraped_urls + uf.web_scrape(fixtures[20:],xpaths)
-
-    # Loop through each fixture
-    dataset = pd.DataFrame()
-    for scraped_url in scraped_urls:
-        # Define objects
-        soup, pages = scraped_url
-
-        # Find game details
-        date = soup.find('div',class_='date date--rwc2024 match-details__date')
-        date = '-'.join([date.find('span',class_=f'date__unit date__unit--{x}').get_text().replace('\n','').replace(',','').strip() for x in ['day-number','month','year']])
-        
-        # Find team names
-        teams = [x.get_text() for x in soup.find_all('div',class_='mc-lineups__team-name')][:2]
-        print(f'    - {teams[0]} vs {teams[1]}')
-        
-        # Find lineup
-        starters_and_subs = [
-            soup.find('div',class_='mc-lineups__team-lineups js-starters'),
-            soup.find('div',class_='mc-lineups__substitutes js-substitutes')
-        ]
-        cols = ['Date','Team','Opposition','No.','Player']
-        df = pd.DataFrame(columns=cols)
-        for lineup in starters_and_subs:
-            for position in lineup.find_all('div',class_='mc-lineups__player-row'):
-                try:
-                    num = position.find('div',class_='mc-lineups__player-number').get_text()
-                except AttributeError:
-                    # Error on https://www.rugbyworldcup.com/2023/match/pool-b-ireland-tonga#stats
-                    num = str(int(df['No.'].tolist()[-1])+1)
-                players = [x.get_text().strip() for x in position.find_all('div',class_='mc-lineups__player-name')]
-                for team, opposition, player in zip(teams,reversed(teams),players):
-                    df = pd.concat([df,pd.DataFrame([[date,team,opposition,num,player]],columns=cols)]).reset_index(drop=True)
-
-        # Loop through the different stat options
-        stat_options = ['General','Attack','Defence']
-        for stat_option, page in zip(stat_options,pages):        
-            # Locate section within Beautiful Soup
-            stat_box = page.find('div',{'data-ui-tab':stat_option})
-            
-            # Scrape the title of each column
-            stat_titles = stat_box.find_all('span',class_='mc-player-stats__header-cell-content')
-            stat_titles = [x.get_text().replace('\t','').replace('\n','').strip() for x in stat_titles]
-            stat_titles[3:] = [f'{stat_option}_{x}' for x in stat_titles[3:]]
-            
-            # Get the data by looping through each
-            stat_input = pd.DataFrame()
-            
-            # Loop through each team
-            for team in range(1,3,1):
-                players = stat_box.find_all('tr',class_=f'mc-player-stats__table-row mc-player-stats__table-row--team-{team}')
-                
-                # Loop through each player
-                for player in players:
-                    stats = [x.get_text().strip() for x in player.find_all('td',class_='mc-player-stats__cell')]
-                    stats[1] = teams[team-1]
-                    stat_input = pd.concat([
-                        stat_input,
-                        pd.DataFrame([stats],columns=stat_titles)
-                    ]).reset_index(drop=True)
-            
-            # Add stats to main dataframe
-            df = df.merge(stat_input,on=['Team','No.','Player'])
-
-        # Add to main dataset
-        dataset = pd.concat([dataset,df]).reset_index(drop=True)
+    xpaths = [config['rwc']['tab_xpath'].format(x+1) for x in range(len(rwc_stat_options))]
+    containers = tab_containers('rwc',rwc_stat_options)
+    checkpoint, done = load_checkpoint('rwc',fixtures)
+    todo = [x for x in fixtures if x not in done]
+    scraped_urls = ws.iter_scrape(todo,xpaths,pool_size=pool_size,cache=cache,parse=False,container=containers,**fast_profile('rwc'))
+
+    # Parse (and checkpoint) each fixture in parallel as soon as it's scraped, then combine with the checkpointed fixtures
+    dataset = uf.parallel_imap(metrics.run_timed,([checkpoint.run,url,parse_rwc_fixture,[html]+pages] for url, html, pages in scraped_urls),processes)
+    dataset = checkpoint.load(done) + list(metrics.recorder.collect(dataset,'parse',website='rwc'))
+    ingested = checkpoint.completed(fixtures)
+    report_failed(fixtures,ingested)
+    if len(ingested) == 0:
+        return
+    dataset = uf.concat_frames(dataset)
 
     # Fix columns
-    col_names = {
-        'General_P' : 'points',
-        'General_MP' : 'minutes',
-        'General_O' : 'offloads',
-        'General_CM' : 'carries_made',
-        'General_HE' : 'handling_errors',
-        'Attack_P' : 'passes',
-        'Attack_M' : 'meters',
-        'Attack_CB' : 'clean_breaks',
-        'Attack_DB' : 'defenders_beaten',
-        'Attack_KFH' : 'kicks_from_hand',
-        'Attack_LW' : 'lineout_won',
-        'Defence_TA' : 'tackles',
-        'Defence_MT' : 'tackles_missed',
-        'Defence_TS' : 'tackles_success',
-        'Defence_TW' : 'turnovers',
-        'Defence_LS' : 'lineout_steal',
-    }
-    dataset.columns = [col_names.get(x,x) for x in dataset.columns]
+    dataset.columns = [config['rwc']['columns'].get(x,x) for x in dataset.columns]
 
     # Fix date column
     dataset.Date = pd.to_datetime(dataset.Date)
 
     # Save to file
     print(f'Scraping Complete - {url}\n')
-    dataset.to_csv(f'{filepath}player_data_rwc.csv',index=False)
+    uf.save_ingested(dataset,'player_data_rwc',filepath,ingested,manifest,manifest_path,['Date','Team','Opposition','Player'],append=incremental)
+    checkpoint.clear()
+    return dataset
 
 # https://www.espn.co.uk/rugby '''
-def scrape_espn():
-    # Use https://www.rugbyworldcup.com/2023/matches to get dates
-    url = 'https://www.rugbyworldcup.com/2023/matches'
-    soup = uf.web_scrape(url)
+def scrape_espn(incremental = incremental):
+    # Use the RWC website's list of matches to get dates
+    url = config['espn']['dates_url']
+    soup = ws.web_scrape(url,backend='http',cache=cache)
     dates = soup.find_all('h2',class_='fixtures__date-title')
-    dates = [x.find('span',class_='regular').get_text().replace('September','09').replace('October','10').split(' ') for x in dates]
-    dates = [f'{x[2]}{x[1]}0{x[0]}' if int(x[0]) < 10 else f'{x[2]}{x[1]}{x[0]}' for x in dates]
+    dates = [pd.to_datetime(x.find('span',class_='regular').get_text()).strftime('%Y%m%d') for x in dates]
 
     # Get fixtures
-    url = 'https://www.espn.co.uk'
-    print(f'Start scraping the ESPN website')
-    dates = [f"{url}/rugby/scoreboard/_/league/164205?date={date}" for date in dates]
-    soups = uf.web_scrape(dates)
+    url = config['espn']['site']
+    print(f'Start scraping the ESPN website - {config["name"]}')
+    dates = [f"{config['espn']['scoreboard_url']}?date={date}" for date in dates]
+    soups = ws.web_scrape(dates,pool_size=pool_size,backend='http',cache=cache)
     fixtures = uf.flatten_list([soup.find_all('a',class_='mobileScoreboardLink') for soup in soups])
     fixtures = [f"{url}{x['href']}" for x in fixtures]
 
-    # For espn, we need to scrape 2 pages for each match. One for the match details and the other for player stats
-    match_details = uf.web_scrape(fixtures)
-    stat_options = ['Scoring','Attacking','Defending','Discipline']
-    xpaths = [f'/html/body/div[4]/section/div/section/section/div/div[2]/div[1]/div[2]/div[1]/ul/li[{x+1}]' for x in range(len(stat_options))]
-    player_stats = uf.web_scrape([x.replace('match','playerstats') for x in fixtures],xpaths)
-
-    # Loop through each fixture
-    dataset = pd.DataFrame()
-    for md, ps in zip(match_details, player_stats):
-        # Find match info
-        date = ' '.join(md.find('div',class_='col-two').find('article',class_='sub-module game-information').find('div',class_='game-date-time').get_text().split(', ')[1:])
-        teams = [x.get_text() for x in  md.find('div',class_='competitors').find_all('span',class_='long-name')]
-        print(f'    - {teams[0]} vs {teams[1]}')
-
-        # Loop through the different stat options
-        soup, pages = ps
-        for stat_option, page in zip(stat_options,pages):
-
-            # Locate section within Beautiful Soup
-            stat_boxes = page.find('div',class_='sub-module tabbedTable').find_all('table',class_='mod-data')
-
-            # Scrape the title of each column
-            cols = ['date','team','opposition','pos','name']
-            stat_titles = stat_boxes[0].find('tr',class_='header')
-            stat_titles = cols + [f'{stat_option}_{x.get_text().strip()}' for x in stat_titles.find_all('th')[1:]]
-
-            # Get the data by looping through each
-            stat_input = pd.DataFrame()
-            for team, opposition, stat_box in zip(teams,reversed(teams),stat_boxes):
-                players = stat_box.find('tbody').find_all('tr')
-                
-                # Loop through each player
-                for player in players:
-                    stats = player.find_all('td')
-                    stats = [date,team,opposition,stats[0].find('span').get_text(),stats[0].find('a').get_text()] + [x.get_text() for x in stats[1:]]
-                    stat_input = pd.concat([
-                        stat_input,
-                        pd.DataFrame([stats],columns=stat_titles)
-                    ]).reset_index(drop=True)
-
-            # Add stats to main dataframe
-            df = stat_input if stat_option == stat_options[0] else df.merge(stat_input,on=cols)
-
-        # Add to main dataset
-        dataset = pd.concat([dataset,df]).reset_index(drop=True)
+    # Skip the fixtures already ingested if running incrementally
+    manifest_path = f'{filepath}manifest_espn.json'
+    manifest = uf.load_manifest(manifest_path,name='player_data_espn',filepath=filepath)
+    manifest = manifest if incremental else {'ingested' : [], 'excluded' : manifest['excluded']}
+    fixtures = uf.new_fixtures(fixtures,manifest)
+    if len(fixtures) == 0:
+        print(f'No new fixtures to scrape - {url}\n')
+        return
+
+    # For espn, we need to scrape 2 pages for each match. One for the match details and the other for player stats (both in the same driver)
+    xpaths = [config['espn']['tab_xpath'].format(x+1) for x in range(len(espn_stat_options))]
+    containers = tab_containers('espn',espn_stat_options)
+    checkpoint, done = load_checkpoint('espn',fixtures)
+    pairs = [(x,x.replace('match','playerstats')) for x in fixtures if x not in done]
+    scraped_urls = ws.iter_scrape(pairs,xpaths,pool_size=pool_size,cache=cache,parse=False,container=containers,**fast_profile('espn'))
+
+    # Parse (and checkpoint) each fixture in parallel as soon as it's scraped, then combine with the checkpointed fixtures
+    dataset = uf.parallel_imap(metrics.run_timed,([checkpoint.run,url[0],parse_espn_fixture,[html],pages] for url, html, pages in scraped_urls),processes)
+    dataset = checkpoint.load(done) + list(metrics.recorder.collect(dataset,'parse',website='espn'))
+    ingested = checkpoint.completed(fixtures)
+    report_failed(fixtures,ingested)
+    if len(ingested) == 0:
+        return
+    dataset = uf.concat_frames(dataset)
 
     # Fix columns
-    col_names = {
-        'Scoring_T' : 'try',
-        'Scoring_TA' : 'try_assist',
-        'Scoring_CG' : 'conversion',
-        'Scoring_PG' : 'penalty',
-        'Scoring_DGC' : 'drop_goal',
-        'Scoring_PTS' : 'points',
-        'Attacking_-' : 'remove',
-        'Attacking_P' : 'passes',
-        'Attacking_R' : 'runs',
-        'Attacking_MR' : 'meters_made',
-        'Attacking_CB' : 'clean_breaks',
-        'Attacking_DB' : 'defenders_beaten',
-        'Attacking_O' : 'offload',
-        'Defending_TC' : 'turnovers_conceded',
-        'Defending_T' : 'tackles',
-        'Defending_MT' : 'tackles_missed',
-        'Defending_LW' : 'lineouts_won',
-        'Discipline_PC' : 'penalties_conceded',
-        'Discipline_YC' : 'yellow_card',
-        'Discipline_RC' : 'red_card',
-    }
-    dataset.columns = [col_names.get(x,x) for x in dataset.columns]
-    dataset.date = [pd.to_datetime(f'{uf.trailing_zero(x[1])}-{x[0]}-{x[2]}') for x in [x.replace('Septiembre','September').split(' ') for x in dataset.date]]
+    dataset.columns = [config['espn']['columns'].get(x,x) for x in dataset.columns]
+    for old, new in config['espn'].get('date_fixes',{}).items():
+        dataset.date = dataset.date.str.replace(old,new,regex=False)
+    dataset.date = [pd.to_datetime(f'{uf.trailing_zero(x[1])}-{x[0]}-{x[2]}') for x in [x.split(' ') for x in dataset.date]]
 
     # Save to file
     print(f'Scraping Complete - {url}\n')
-    dataset.to_csv(f'{filepath}player_data_espn.csv',index=False)
+    uf.save_ingested(dataset,'player_data_espn',filepath,ingested,manifest,manifest_path,['date','team','opposition','name'],append=incremental)
+    checkpoint.clear()
+    return dataset
 
 # https://en.wikipedia.org/wiki/2023_Rugby_World_Cup_final '''
 def scrape_wiki():
     # Get links to the wiki page for the fixtures
-    print(f'Start scraping https://en.wikipedia.org/wiki/2023_Rugby_World_Cup')
-    urls = [
-        'https://en.wikipedia.org/wiki/2023_Rugby_World_Cup_Pool_A',
-        'https://en.wikipedia.org/wiki/2023_Rugby_World_Cup_Pool_B',
-        'https://en.wikipedia.org/wiki/2023_Rugby_World_Cup_Pool_C',
-        'https://en.wikipedia.org/wiki/2023_Rugby_World_Cup_Pool_D',
-        'https://en.wikipedia.org/wiki/2023_Rugby_World_Cup_knockout_stage',
-    ]
+    print(f'Start scraping wikipedia - {config["name"]}')
+    urls = config['wiki']['urls']
 
     # Scrape the websites
-    dataset = pd.DataFrame()
-    soups = uf.web_scrape(urls)
-    for soup in soups:
-
-        # Extract fixture information
-        tables = [x for x in soup.find_all('table') if 'Player of the Match:' in x.get_text()]
-        summaries = soup.find_all('div',class_='vevent summary')
-        
-        # Loop through the summary section and the area tgat says who the motm is
-        for summary, table in zip(summaries,tables):
-            # Get summary details
-            match_details = summary.find_all('table')
-            result = match_details[1].find('tr',{'style':'vertical-align:top;font-weight:bold'}).find_all('td')
-
-            # Add to dataset  
-            dataset = pd.concat([dataset,pd.DataFrame([{
-                'date' : ' '.join(match_details[0].find('td').get_text().split(' ')[:2]+['2023']),
-                'team_home' : result[0].find('a').get_text(),
-                'score' : result[1].get_text(),
-                'team_away' : result[2].find('a').get_text(),
-                'location' : match_details[2].find('span',class_='location').get_text(),
-                'referee' : match_details[2].find('span',class_='attendee').find('a').get_text(),
-                'motm' : [x.find('a').get_text() for x in table.find_all('p') if x.find('b').get_text() == 'Player of the Match:'][0]
-            }])]).reset_index(drop=True)
+    htmls = ws.web_scrape(urls,pool_size=pool_size,backend='http',cache=cache,parse=False)
+    dataset = uf.parallel_map(metrics.run_timed,[[parse_wiki_page,x] for x in htmls],processes)
+    dataset = uf.concat_frames(list(metrics.recorder.collect(dataset,'parse',website='wiki')))
 
     # Fix date column
     dataset.date = [pd.to_datetime(f'{uf.trailing_zero(x[0])}-{x[1]}-{x[2]}') for x in [x.split(' ') for x in dataset.date]]        
 
     # Save to file
-    print(f'Scraping Complete - https://en.wikipedia.org/wiki/2023_Rugby_World_Cup\n')
-    dataset.to_csv(f'{filepath}match_data_wiki.csv',index=False)
+    print(f'Scraping Complete - wikipedia\n')
+    storage.write_dataset(dataset,'match_data_wiki',filepath)
+    return dataset
 
 
 ##################################################################################################################################
 ''' Run each function '''
 ##################################################################################################################################
 if __name__ == '__main__':
-    #scrape_rwc()
-    scrape_espn()
-    #scrape_wiki()
\ No newline at end of file
+    # Choose the websites to scrape, e.g. python scripts/rwc_2023/data_scraping.py rwc wiki (all of the tournament's websites if none are listed)
+    websites = {x : y for x, y in [('rwc',scrape_rwc),('espn',scrape_espn),('wiki',scrape_wiki)] if x in config}
+    chosen = [x for x in sys.argv[1:] if not x.startswith('--')]
+    chosen = chosen if len(chosen) > 0 else list(websites)
+    if any([x not in websites for x in chosen]):
+        raise ValueError(f"Websites to scrape must be from the following options: {', '.join(websites)}")
+    for x in chosen:
+        metrics.recorder.run_stage(websites[x])
+
+    # Save & print the metrics of the run
+    metrics.recorder.save(f'{filepath}metrics_data_scraping_{"_".join(chosen)}.json')
+    metrics.recorder.report()
\ No newline at end of file
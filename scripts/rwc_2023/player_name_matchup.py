@@ -1,13 +1,14 @@
 '''
     Filename: player_name_matchup.py
-    Purpose: To generate a lookup file for the names used for players in the respective websites (RWC 2023 website, ESPN & Wikipedia).
+    Purpose: To generate a lookup file for the names used for players in the respective websites (RWC website, ESPN & Wikipedia).
+    Usage: python scripts/rwc_2023/player_name_matchup.py [--tournament=rwc_2023] [--rematch]
 '''
 
 ##################################################################################################################################
 ''' Initialising script '''
 ##################################################################################################################################
 # Import packages
-import os, sys
+import os, sys, json
 import pandas as pd
 from pathlib import Path
 from unidecode import unidecode
@@ -17,12 +18,49 @@ module_path = os.path.abspath(os.path.join(''))
 if module_path not in sys.path:
     sys.path.append(module_path)
 
+# Tournament to run for (run with --tournament=<name> to choose, see scripts/tournaments.py)
+import scripts.tournaments as tournaments
+config = tournaments.load_config(tournaments.from_argv())
+
 # Output Directory
-filepath = 'data/rwc_2023/'
+filepath = tournaments.partition_path(config)
 Path(filepath).mkdir(parents=True, exist_ok=True)
 
 # Import functinos
 import scripts.useful_functions as uf
+import scripts.storage as storage
+import scripts.metrics as metrics
+
+# Names that couldn't be matched up are only tried again in the teams with new RWC players to match them to (run with --rematch to try
+# every one of them again)
+rematch = '--rematch' in sys.argv
+
+# Create name_link column
+def name_link(names):
+    names = [unidecode(x) for x in names]
+    return [(x.split(" ")[0][0] + ". " + " ".join(x.split(" ")[1:])).lower() for x in names]
+
+
+
+##################################################################################################################################
+''' Load the alias index '''
+##################################################################################################################################
+# Manual name fixes, e.g. {'espn' : {'J Flier':'J. Van Der Flier'}}
+name_fixes = {}
+if os.path.exists(config['name_fixes']):
+    with open(config['name_fixes']) as f:
+        name_fixes = json.load(f)
+
+# Load the names that have already been matched up. The first time round, start from the previous lookup if there is one
+store = uf.AliasStore(f'{filepath}player_aliases.csv',name_fixes)
+if len(store) == 0 and storage.dataset_exists('player_lookup',filepath):
+    store.seed(storage.read_dataset('player_lookup',filepath))
+
+# Names matched up under a name fix that's since been changed are matched up again
+refreshed = store.refresh()
+if refreshed > 0:
+    print(f'{refreshed} player aliases dropped as their name fixes have changed')
+print(f'{len(store)} player aliases already matched up')
 
 
 
@@ -30,36 +68,20 @@ import scripts.useful_functions as uf
 ''' Import and clean data - RWC '''
 ##################################################################################################################################
 # Download data
-df_rwc = pd.read_csv(f'{filepath}player_data_rwc.csv')
+df_rwc = storage.read_dataset('player_data_rwc',filepath,columns=['Player','Team'])
 df_rwc = df_rwc[['Player','Team']].drop_duplicates().rename(columns={'Player':'Name'}).reset_index(drop=True)
 
 # Rename name column
 df_rwc.rename(inplace=True,columns={'Name':'name_rwc','Team':'team'})
 
-# Manual name fix
-rwc_name_fix = {
-    'Guido Petti Pagadizabal':'G. Petti',
-    'David Wallis':'D. Carvalho',
-    'Diogo Hasse Ferreira':'D. Ferreira',
-    'James Lay':'J. Lay (James)',
-    'Jordan Lay':'J. Lay (Jordan)',
-    'Ulupano Junior Seuteni':'U. Seuteni',
-    'Taleni Junior Agaese Seu':'T. Seu',
-    'Sa Jordan Taufua':'J. Taufua',
-    "Alai D'Angelo Leuila":'D. Leuila',
-    'Salesi Piutau':'C. Piutau',
-    'Halaleva Fifita':'L. Fifita',
-    'Felipe Arcos Perez':'Felipe Perez',
-    'Juan Manuel Rodríguez':'Juan Rodríguez',
-    'Juan Manuel Alonso':'Juan Alonso',
-    'Jeronimo de la Fuente':'Jeronimo Fuente'
-}
-df_rwc['name_rwc2'] = [rwc_name_fix.get(x,x) for x in df_rwc['name_rwc']]
+# The RWC names are the player IDs, so new ones can go straight in the index
+unseen = store.unseen(df_rwc,'rwc','name_rwc')
+for name, team in zip(unseen.name_rwc,unseen.team):
+    store.add('rwc',team,name,name)
+retry = set(df_rwc.team) if rematch else set(unseen.team)
 
 # Create name_link column
-df_rwc["name_link"] = [unidecode(x).split(" ")[0][0] + ". " + " ".join(unidecode(x).split(" ")[1:]) for x in df_rwc.name_rwc2]
-df_rwc["name_link"] = df_rwc["name_link"].str.lower()
-df_rwc.drop(inplace=True,columns='name_rwc2')
+df_rwc["name_link"] = name_link([store.fix('rwc',x) for x in df_rwc.name_rwc])
 
 
 
@@ -67,66 +89,15 @@ df_rwc.drop(inplace=True,columns='name_rwc2')
 ''' Import and clean data - ESPN'''
 ##################################################################################################################################
 # Download data
-df_espn = pd.read_csv(f'{filepath}player_data_espn.csv')
+df_espn = storage.read_dataset('player_data_espn',filepath,columns=['name','team'])
 df_espn = df_espn[['name','team']].drop_duplicates().reset_index(drop=True)
 
 # Rename name column
 df_espn.rename(inplace=True,columns={'name':'name_espn'})
 
-# Manual name fix
-espn_name_fix = {
-    'J Gonzalez':'J. Martin Gonzalez',
-    'J Mallia':'J. Cruz Mallia',
-    'F Kodela':'F. Gómez Kodela',
-    'L Velez':'L. Bazan Velez',
-    'L Luna':'L. Cinti',
-    'J Larenas':'J. Ignacio Larenas',
-    'J Albornoz':'J. Carrasco',
-    'M Otero':'M. Torrealba',
-    'T Cirikidaveta':'T. Ahiwaru Cirikidaveta',
-    'J Flier':'J. Van Der Flier',
-    'J Brex':'J. Ignacio Brex',
-    'A Valu':'A. Ai Valu',
-    'T Jaarsveld':'T. Van Jaarsveld',
-    'J (Jnr)':'J. Deysel',
-    'L Westhuizen':'L. Van Der Westhuizen',
-    'T Klerk':'T. De Klerk',
-    'A Berg':'A. Van Der Berg',
-    'L Malan':'L. Roux Malan',
-    'P Lill':'P. Van Lill',
-    'E Groot':'E. De Groot',
-    'N Guedes':'N. Sousa Guedes',
-    'T Freitas':'T. De Freitas',
-    'M Pinto':'M. Cardoso Pinto',
-    'T Fonovai':'F. Tangimana',
-    'N Wong':'N. Ah-Wong',
-    'D Merwe':'D. Van Der Merwe',
-    'P Toit':'P. Du Toit',
-    'F Klerk':'F. De Klerk',
-    'D Allende':'D. De Allende',
-    'M Staden':'M. Van Staden',
-    'W Roux':'W. Le Roux',
-    'S Havili-Talitui':'S. Talitui',
-    'S Havili':'S. Talitui',
-    'F Pisano':'F. Berchesi',
-    'G Lordon':'G. Kessler',
-    'G Valente':'G. Mieres',
-    'B Saavedra':'B. Amaya',
-    'A Hontou':'A. Vilaseca',
-    'T Rachetti':'T. Inciarte',
-    'I Uria':'T. Inciarte',
-    'M Olaso':'M. Diana',
-    'L Bonfiglio':'L. Bianchi',
-    'A Coetzee':'J Coetzee',
-    'H Shifuka':'H Shikufa',
-    'S Todua':'A Todua'
-}
-df_espn['name_espn2'] = [espn_name_fix.get(x,x) for x in df_espn['name_espn']]
-
-# Create name_link column
-df_espn["name_link"] = [unidecode(x).split(" ")[0][0] + ". " + " ".join(unidecode(x).split(" ")[1:]) for x in df_espn.name_espn2]
-df_espn["name_link"] = df_espn["name_link"].str.lower()
-df_espn.drop(inplace=True,columns='name_espn2')
+# Only the names that aren't in the index need matching up (and the ones that couldn't be matched up before, in the teams to retry)
+df_espn = store.unseen(df_espn,'espn','name_espn',retry=retry).reset_index(drop=True)
+df_espn["name_link"] = name_link([store.fix('espn',x) for x in df_espn.name_espn])
 
 
 
@@ -134,7 +105,7 @@ df_espn.drop(inplace=True,columns='name_espn2')
 ''' Import and clean data - Wiki'''
 ##################################################################################################################################
 # Download data
-df_wiki = pd.read_csv(f'{filepath}match_data_wiki.csv')
+df_wiki = storage.read_dataset('match_data_wiki',filepath,columns=['motm','team_home','team_away'])
 df_wiki = pd.concat([
     df_wiki[['motm','team_home']].drop_duplicates().rename(columns={'team_home':'team'}),
     df_wiki[['motm','team_away']].drop_duplicates().rename(columns={'team_away':'team'}),
@@ -143,9 +114,40 @@ df_wiki = pd.concat([
 # Rename name column
 df_wiki.rename(inplace=True,columns={'motm':'name_wiki'})
 
-# Create name_link column
-df_wiki["name_link"] = [unidecode(x).split(" ")[0][0] + ". " + " ".join(unidecode(x).split(" ")[1:]) for x in df_wiki.name_wiki]
-df_wiki["name_link"] = df_wiki["name_link"].str.lower()
+# Only the names that aren't in the index need matching up (and the ones that couldn't be matched up before, in the teams to retry)
+df_wiki = store.unseen(df_wiki,'wiki','name_wiki',retry=retry).reset_index(drop=True)
+df_wiki["name_link"] = name_link(df_wiki.name_wiki)
+
+
+
+##################################################################################################################################
+''' Match up the new names '''
+##################################################################################################################################
+# Match the new names against the RWC players in the same teams, leaving out the players that already have a name from the source so
+# each player only ever has one
+for source, df in [('espn',df_espn),('wiki',df_wiki)]:
+    if len(df) == 0:
+        continue
+    new = sum([store.get(source,team,name) == None for team, name in zip(df.team,df[f'name_{source}'])])
+    print(f'Matching up {new} new {source} names' + (f' and {len(df)-new} unmatched names again' if len(df) > new else ''))
+    claimed = store.claimed(source)
+    unclaimed = pd.Series([(team,name) not in claimed for team, name in zip(df_rwc.team,df_rwc.name_rwc)],index=df_rwc.index)
+    candidates = df_rwc[df_rwc.team.isin(df.team) & unclaimed]
+    with metrics.recorder.stage(f'matching_{source}') as stage:
+        matches = uf.matching(candidates,df)
+        stage['rows'] = len(matches)
+    matches = matches[(matches.name_rwc.notnull()) & (matches[f'name_{source}'].notnull())]
+    for name, team, player_id in zip(matches[f'name_{source}'],matches.team,matches.name_rwc):
+        store.add(source,team,name,player_id)
+
+    # Store the names that couldn't be matched up as '', so they aren't matched up again on every run (e.g. the man of the match is listed
+    # against both teams, but only belongs to one)
+    for name, team in zip(df[f'name_{source}'],df.team):
+        if store.get(source,team,name) == None:
+            store.add(source,team,name,'')
+
+# Save the index
+store.save()
 
 
 
@@ -153,11 +155,14 @@ df_wiki["name_link"] = df_wiki["name_link"].str.lower()
 ''' Create lookup '''
 ##################################################################################################################################
 # Start with Fantasy & Rugby Pass
-lookup = uf.matching(df_rwc,df_espn)
+cols = ['team','player_id']
+lookup = uf.join(store.frame('rwc').rename(columns={'raw_name':'name_rwc'}),cols,store.frame('espn').rename(columns={'raw_name':'name_espn'}),cols)
 # Match up to wiki
-lookup = uf.matching(lookup,df_wiki)
-# The ones that didn't match can just be removed (it's like 3 people so who cares)
-lookup = lookup[(lookup.name_rwc.notnull()) & (lookup.name_espn.notnull())]
+lookup = uf.join(lookup,cols,store.frame('wiki').rename(columns={'raw_name':'name_wiki'}),cols,out='left_join')
 # Save to file
 lookup = lookup[['name_rwc','name_espn','name_wiki','team']]
-lookup.to_csv(f'{filepath}player_lookup.csv',index=False)
+storage.write_dataset(lookup,'player_lookup',filepath,csv=True)
+
+# Save & print the metrics of the run
+metrics.recorder.save(f'{filepath}metrics_player_name_matchup.json')
+metrics.recorder.report()
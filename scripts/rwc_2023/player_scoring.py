@@ -1,6 +1,7 @@
 '''
     Filename: player_scoring.py
-    Purpose: To apply the 6 Nations 2024 points system to the 2023 RWC dataset.
+    Purpose: To apply a tournament's points system (the 6 Nations 2024 one for the 2023 RWC, the default tournament) to its dataset, and
+             compare it against the other rule sets.
 '''
 
 ##################################################################################################################################
@@ -9,7 +10,6 @@
 # Import packages
 import os, sys
 import pandas as pd
-from math import floor
 from pathlib import Path
 
 # Fix pathway
@@ -17,144 +17,170 @@ module_path = os.path.abspath(os.path.join(''))
 if module_path not in sys.path:
     sys.path.append(module_path)
 
+# Tournament to run for (run with --tournament=<name> to choose, see scripts/tournaments.py)
+import scripts.tournaments as tournaments
+config = tournaments.load_config(tournaments.from_argv())
+
 # Output Directory
-filepath = 'data/rwc_2023/'
+filepath = tournaments.partition_path(config)
 Path(filepath).mkdir(parents=True, exist_ok=True)
 
 # Import functinos
 import scripts.useful_functions as uf
+import scripts.storage as storage
+import scripts.fantasy_scoring as fs
+import scripts.squad_optimizer as so
+import scripts.projection as pj
+import scripts.metrics as metrics
 
 
 
 ##################################################################################################################################
-''' Useful variables '''
-##################################################################################################################################
-# Define rules
-scoring = {
-    'try' : 10,
-    'try_assist' : 4,
-    'conversion' : 2,
-    'penalty' : 3,
-    'drop_goal' : 5,
-    'defenders_beaten' : 2,
-    'meters_made' : 1,
-    #'50-22' : 7,
-    'tackles' : 1,
-    'breakdown_steals' : 5,
-    'lineout_steal' : 7,
-    'penalties_conceded' : -1,
-    'motm' : 15,
-    'yellow_card' : -3,
-    'red_card' : -6,
-}
-
-# Import lookup
-lkup = pd.read_csv(f'{filepath}player_lookup.csv')
-lkup = lkup[['name_rwc','name_espn','team']]
-
-
-
-##################################################################################################################################
-''' ESPN data '''
-##################################################################################################################################
-# Download data
-df_espn = pd.read_csv(f'{filepath}player_data_espn.csv')
-
-# Map player names
-cols=['name','team']
-df_espn = uf.join(lkup.rename(columns={'name_espn':'name'}),cols,df_espn,cols)
-
-# Clean/filter columns
-df_espn = df_espn[[
-    'date',
-    'team',
-    'opposition',
-    'name_rwc',
-    'try',
-    'try_assist',
-    'conversion',
-    'penalty',
-    'drop_goal',
-    'defenders_beaten',
-    'meters_made',
-    'tackles',
-    'penalties_conceded',
-    'yellow_card',
-    'red_card'
-]]
-df_espn.rename(inplace=True,columns={'name_rwc':'name'})
-
-
-
+''' Run the scoring '''
 ##################################################################################################################################
-''' RWC Data '''
-##################################################################################################################################
-# Download data
-df_rwc = pd.read_csv(f'{filepath}player_data_rwc.csv')
-
-# Clean/filter columns
-df_rwc = df_rwc[[
-    'Date',
-    'Team',
-    'Opposition',
-    'Player',
-    'No.',
-    'turnovers',
-    'lineout_steal',
-]]
-df_rwc.columns = [x.lower() for x in df_rwc.columns]
-df_rwc.rename(inplace=True, columns={'player':'name'})
-
-
-
-##################################################################################################################################
-''' Wiki data '''
-##################################################################################################################################
-# Download
-df_wiki = pd.read_csv(f'{filepath}match_data_wiki.csv')
-
-# Clean/filter columns
-df_wiki = df_wiki[['date','motm']].rename(columns={'motm':'name'})
-df_wiki['motm'] = 1
-
+# Score the tournament's dataset, compare the rule sets, project the points & pick the squads. Kept in main() as the projection & squad
+# picking share their work between processes, and processes started by spawning (the default on macOS) import this script again
+def main():
+    # Define rules. Every rule set is kept in the tournament's rulesets/ folder (e.g. scripts/rwc_2023/rulesets/), and its config names the one
+    # used as its points system. The others are compared against it
+    rulesets = fs.load_rulesets(config['rulesets']) if os.path.exists(config['rulesets']) else {}
+    if config.get('scoring') not in rulesets:
+        raise ValueError(f"'scoring' in the config must be one of the rule sets in {config['rulesets']}: {', '.join(rulesets)}")
+    scoring = rulesets[config['scoring']]
+
+    # Import lookup
+    lkup = storage.read_dataset('player_lookup',filepath,columns=['name_rwc','name_espn','team'])
+
+    # -- ESPN data --
+    # Download data
+    df_espn = storage.read_dataset('player_data_espn',filepath)
+
+    # Map player names
+    cols=['name','team']
+    df_espn = uf.join(lkup.rename(columns={'name_espn':'name'}),cols,df_espn,cols)
+
+    # Clean/filter columns
+    df_espn = df_espn[[
+        'date',
+        'team',
+        'opposition',
+        'name_rwc',
+        'try',
+        'try_assist',
+        'conversion',
+        'penalty',
+        'drop_goal',
+        'defenders_beaten',
+        'meters_made',
+        'tackles',
+        'penalties_conceded',
+        'yellow_card',
+        'red_card'
+    ]]
+    df_espn.rename(inplace=True,columns={'name_rwc':'name'})
+
+    # -- RWC Data --
+    # Download data
+    df_rwc = storage.read_dataset('player_data_rwc',filepath,columns=[
+        'Date',
+        'Team',
+        'Opposition',
+        'Player',
+        'No.',
+        'turnovers',
+        'lineout_steal',
+    ])
+
+    # Clean/filter columns
+    df_rwc.columns = [x.lower() for x in df_rwc.columns]
+    df_rwc.rename(inplace=True, columns={'player':'name'})
+
+    # -- Wiki data --
+    # Download
+    df_wiki = storage.read_dataset('match_data_wiki',filepath,columns=['date','motm'])
+
+    # Clean/filter columns
+    df_wiki = df_wiki.rename(columns={'motm':'name'})
+    df_wiki['motm'] = 1
+
+    # -- Combine Data --
+    # Merge data
+    cols = ['date','team','opposition','name']
+    with metrics.recorder.stage('combine') as stage:
+        dataset = uf.join(df_rwc,cols,df_espn,cols)
+        dataset = uf.join(dataset,['date','name'],df_wiki,['date','name'],out='left_join')
+        dataset['motm'] = dataset['motm'].fillna(0)
+        stage['rows'] = len(dataset)
+
+    # Fix column names
+    col_fix = {
+        'turnovers':'breakdown_steals',
+        'defender_beaten':'defenders_beaten',
+    }
+    dataset.columns = [col_fix.get(x,x) for x in dataset.columns]
+
+    # Save dataset before applying the scores
+    storage.write_dataset(dataset,'player_data',filepath,csv=True)
+
+    # Score (meters made are scored per 10 meters, see fantasy_scoring.per_units)
+    cols = cols + ['no.']
+    with metrics.recorder.stage('score') as stage:
+        scores = fs.score(dataset,scoring,cols)
+        stage['rows'] = len(scores)
+
+    # Save
+    storage.write_dataset(scores,'fantasy_scores',filepath,csv=True)
+
+    # -- Compare rule sets --
+    # Score every rule set saved in the rulesets directory in one go, and rank the players under each one
+    with metrics.recorder.stage('score_rulesets') as stage:
+        totals = fs.score_rulesets(dataset,rulesets,cols)
+        stage['rows'] = len(totals)
+    storage.write_dataset(totals,'fantasy_scores_rulesets',filepath,csv=True)
+    storage.write_dataset(fs.rank_rulesets(totals,rulesets),'fantasy_rankings',filepath,csv=True)
+
+    # -- Project points --
+    # Project each player's points in their next match under each rule set, with the spread around it, by simulating the
+    # match many times from their stats so far (see projection.py). The number of simulations & percentiles are set in the config
+    projection = config.get('projection',{})
+    with metrics.recorder.stage('project') as stage:
+        projections = pj.project(
+            dataset,
+            rulesets,
+            sims=projection.get('sims',100000),
+            percentiles=projection.get('percentiles',pj.default_percentiles),
+            method=projection.get('method','stats'),
+            last=projection.get('last'),
+        )
+        stage['rows'] = len(projections)
+    storage.write_dataset(projections,'fantasy_projections',filepath,csv=True)
+
+    # -- Pick squads --
+    # Pick the best squad under each rule set, within the tournament's squad slots, team cap & budget (see squad_optimizer.py).
+    # The budget is only used if the tournament has a prices.csv (name, team & price of each player). Scenarios no squad fits are skipped
+    squad = config.get('squad',{})
+    prices = pd.read_csv(config['prices']) if os.path.exists(config['prices']) else None
+    scenarios = [{
+        'name' : x,
+        'value' : x,
+        'slots' : squad.get('slots',so.squad_slots),
+        'team_cap' : squad.get('team_cap'),
+        'budget' : squad.get('budget') if prices is not None else None,
+        'unit' : squad.get('price_unit',0.5),
+    } for x in rulesets]
+    with metrics.recorder.stage('pick_squads') as stage:
+        candidates = so.candidates(totals,list(rulesets),prices=prices)
+        squads = so.optimize_scenarios(candidates,scenarios,errors='skip')
+        stage['rows'] = len(squads)
+    storage.write_dataset(squads,'fantasy_squads',filepath,csv=True)
+
+    # Save & print the metrics of the run
+    metrics.recorder.save(f'{filepath}metrics_player_scoring.json')
+    metrics.recorder.report()
 
 
 ##################################################################################################################################
-''' Combine Data '''
+''' Run the script '''
 ##################################################################################################################################
-# Merge data
-cols = ['date','team','opposition','name']
-dataset = uf.join(df_rwc,cols,df_espn,cols)
-dataset = uf.join(dataset,['date','name'],df_wiki,['date','name'],out='left_join')
-dataset['motm'] = dataset['motm'].fillna('0')
-
-# Fix column names
-col_fix = {
-    'turnovers':'breakdown_steals',
-    'defender_beaten':'defenders_beaten',
-}
-dataset.columns = [col_fix.get(x,x) for x in dataset.columns]
-
-# Save dataset before applying the scores
-dataset.to_csv(f'{filepath}player_data.csv',index=False)
-
-# Manipulate the metres made & motm column
-dataset['meters_made'] = [floor(int(x)/10) for x in dataset['meters_made']]
-
-# Collapse
-dataset = pd.melt(dataset, id_vars=dataset.columns.tolist()[0:5], value_vars=dataset.columns.tolist()[5:])
-dataset.value = [int(str(x).replace('-','0').split('.')[0]) for x in dataset.value]
-
-# Score
-cols = cols + ['no.']
-dataset['scoring'] = [score * scoring.get(x,0) for score,x in zip(dataset.value,dataset.variable)]
-totals = dataset.groupby(cols).scoring.sum().reset_index()
-totals['variable'] = 'total'
-dataset = pd.concat([totals,dataset.drop(columns='value')]).reset_index(drop=True)
-
-# Tidy
-dataset = pd.pivot_table(dataset,values='scoring', index=dataset.columns.tolist()[0:5],columns='variable').reset_index()
-dataset = dataset[cols + ['total'] + [x for x,y in scoring.items()]]
-
-# Save
-dataset.to_csv(f'{filepath}fantasy_scores.csv',index=False)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
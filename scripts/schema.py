@@ -0,0 +1,187 @@
+'''
+    Filename: schema.py
+    Purpose: The types of every column in the datasets passed between the scripts. Stats are stored as small whole numbers (with '-' turned
+             into 0 once, when the data is ingested), and the team & player names are stored as categoricals sharing one dictionary per kind
+             of key, so the joins & group bys between the datasets run on integer codes rather than hashing the same strings over and over.
+'''
+
+##################################################################################################################################
+''' Importing packages '''
+##################################################################################################################################
+# Import packages
+import threading
+import pandas as pd
+
+
+##################################################################################################################################
+''' Schemas '''
+##################################################################################################################################
+# Types each column can be stored as
+#   - 'date' = Datetime
+#   - 'str' = String
+#   - 'team' = Team name, stored as a categorical using the shared team dictionary
+#   - 'player' = Player name (from any website), stored as a categorical using the shared player dictionary
+#   - 'count' = Whole number, with '-' (no stat recorded) stored as 0
+#   - 'float' = Decimal number, with '-' stored as 0 and any '%' removed
+dtypes = {
+    'date' : 'datetime64[ns]',
+    'str' : 'string',
+    'team' : 'category',
+    'player' : 'category',
+    'count' : 'Int16',
+    'float' : 'Float64',
+}
+
+# Kinds of column that are keys, each with its own shared dictionary
+key_kinds = ['team','player']
+
+# Schema of each dataset. Columns that aren't listed keep whatever type pandas gives them
+schemas = {
+    'player_data_rwc' : {
+        'Date':'date', 'Team':'team', 'Opposition':'team', 'No.':'count', 'Player':'player',
+        'points':'count', 'minutes':'count', 'offloads':'count', 'carries_made':'count', 'handling_errors':'count',
+        'passes':'count', 'meters':'count', 'clean_breaks':'count', 'defenders_beaten':'count', 'kicks_from_hand':'count',
+        'lineout_won':'count', 'tackles':'count', 'tackles_missed':'count', 'tackles_success':'float', 'turnovers':'count',
+        'lineout_steal':'count',
+    },
+    'player_data_espn' : {
+        'date':'date', 'team':'team', 'opposition':'team', 'pos':'str', 'name':'player',
+        'try':'count', 'try_assist':'count', 'conversion':'count', 'penalty':'count', 'drop_goal':'count', 'points':'count',
+        'passes':'count', 'runs':'count', 'meters_made':'count', 'clean_breaks':'count', 'defenders_beaten':'count',
+        'offload':'count', 'turnovers_conceded':'count', 'tackles':'count', 'tackles_missed':'count', 'lineouts_won':'count',
+        'penalties_conceded':'count', 'yellow_card':'count', 'red_card':'count',
+    },
+    'match_data_wiki' : {
+        'date':'date', 'team_home':'team', 'score':'str', 'team_away':'team', 'location':'str', 'referee':'str', 'motm':'player',
+    },
+    'player_lookup' : {
+        'name_rwc':'player', 'name_espn':'player', 'name_wiki':'player', 'team':'team',
+    },
+    'player_data' : {
+        'date':'date', 'team':'team', 'opposition':'team', 'name':'player', 'no.':'count',
+        'breakdown_steals':'count', 'lineout_steal':'count', 'try':'count', 'try_assist':'count', 'conversion':'count',
+        'penalty':'count', 'drop_goal':'count', 'defenders_beaten':'count', 'meters_made':'count', 'tackles':'count',
+        'penalties_conceded':'count', 'yellow_card':'count', 'red_card':'count', 'motm':'count',
+    },
+    'fantasy_scores' : {
+        'date':'date', 'team':'team', 'opposition':'team', 'name':'player', 'no.':'count', 'total':'float',
+    },
+    'fantasy_scores_rulesets' : {
+        'date':'date', 'team':'team', 'opposition':'team', 'name':'player', 'no.':'count',
+    },
+    'fantasy_rankings' : {
+        'name':'player', 'team':'team', 'ruleset':'str', 'total':'float', 'rank':'count',
+    },
+    'fantasy_projections' : {
+        'name':'player', 'team':'team', 'ruleset':'str', 'matches':'count', 'mean':'float', 'std':'float',
+    },
+    'fantasy_squads' : {
+        'scenario':'str', 'name':'player', 'team':'team', 'slot':'str', 'price':'float',
+    },
+}
+
+
+
+##################################################################################################################################
+''' Shared dictionaries '''
+##################################################################################################################################
+# Dictionary of the values a kind of key can take
+class KeyDictionary:
+    '''
+        Purpose: To keep every value seen for a kind of key (e.g. every team name) in one sorted list, shared by every dataset loaded in
+                 this process, so the same name has the same code wherever it appears
+    '''
+    def __init__(self):
+        self.categories = pd.Index([], dtype='object')
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.categories)
+
+    def intern(self, values):
+        '''
+            Purpose: To add any values that haven't been seen yet to the dictionary
+            Output: The dictionary's categories
+        '''
+        values = pd.Index(pd.unique(values)).dropna()
+        with self.lock:
+            new = values.difference(self.categories)
+            if len(new) > 0:
+                # Sorted explicitly, as a union with the empty dictionary keeps the values in the order they were first seen
+                self.categories = self.categories.union(new).sort_values()
+            return self.categories
+
+# The dictionary of each kind of key
+dictionaries = {x : KeyDictionary() for x in key_kinds}
+
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Turn a column into a key
+def as_key(values, kind):
+    '''
+        Purpose: To store a column of names as a categorical using the shared dictionary of its kind of key
+        Inputs:
+            - values = Series of names (text or already categorical)
+            - kind = Kind of key, one of key_kinds
+    '''
+    dictionary = dictionaries[kind]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = dictionary.intern(values.cat.categories)
+        return values if values.cat.categories.equals(categories) else values.cat.set_categories(categories)
+    categories = dictionary.intern(values)
+    return pd.Series(pd.Categorical(values, categories=categories), index=values.index, name=values.name)
+
+# Give the keys of two dataframes the same categories
+def align_keys(left, lcols, right, rcols):
+    '''
+        Purpose: To give each pair of categorical keys the same categories (the union of both), so they're joined on their codes. Keys from the
+                 same dictionary only differ when the dictionary has grown since one of them was made
+        Output: The two dataframes, only copied if a key had to change
+    '''
+    for lcol, rcol in zip(lcols,rcols):
+        lkey, rkey = left[lcol], right[rcol]
+        if not isinstance(lkey.dtype, pd.CategoricalDtype) or not isinstance(rkey.dtype, pd.CategoricalDtype) or lkey.dtype == rkey.dtype:
+            continue
+        categories = lkey.cat.categories.union(rkey.cat.categories)
+        left = left.assign(**{lcol : lkey.cat.set_categories(categories)})
+        right = right.assign(**{rcol : rkey.cat.set_categories(categories)})
+    return left, right
+
+# Convert a dataframe to a dataset's schema
+def apply_schema(df, name):
+    '''
+        Purpose: To convert the columns of a dataframe to the types in the dataset's schema, leaving the columns already of that type alone
+    '''
+    schema = schemas.get(name,{})
+    df = df.copy()
+    for col in [x for x in df.columns if x in schema]:
+        kind = schema[col]
+        if kind in key_kinds:
+            df[col] = as_key(df[col],kind)
+        elif str(df[col].dtype) == dtypes[kind]:
+            continue
+        elif kind == 'date':
+            df[col] = pd.to_datetime(df[col])
+        elif kind == 'str':
+            df[col] = df[col].astype(dtypes[kind])
+        else:
+            # Stats come through as text with '-' for no stat recorded
+            values = df[col] if pd.api.types.is_numeric_dtype(df[col]) else df[col].astype('string').str.strip().replace('-','0').str.replace('%','',regex=False)
+            values = pd.to_numeric(values)
+            df[col] = values.round().astype(dtypes[kind]) if kind == 'count' else values.astype(dtypes[kind])
+    return df
+
+# Bring a dataframe's keys up to date with the shared dictionaries
+def share_keys(df, name):
+    '''
+        Purpose: To set the categories of a dataset's keys to the shared dictionaries as they are now, e.g. before stacking datasets loaded
+                 at different times (the dictionaries may have grown in between)
+    '''
+    schema = schemas.get(name,{})
+    df = df.copy()
+    for col in [x for x in df.columns if schema.get(x) in key_kinds]:
+        df[col] = as_key(df[col],schema[col])
+    return df
@@ -0,0 +1,293 @@
+'''
+    Filename: squad_optimizer.py
+    Purpose: Pick the fantasy squad scoring the most points from the scored players, filling a set number of slots for each position (each
+             player's slot comes from the squad number they wear most), with at most so many players from one team and the squad's
+             price within a budget. The squad is found by branch & bound, bounded by a knapsack table of the best points each slot can
+             add for every budget, after dropping the players that can never make the best squad.
+'''
+
+##################################################################################################################################
+''' Importing packages and fixing pathway '''
+##################################################################################################################################
+# Import packages
+import os, sys
+import numpy as np
+import pandas as pd
+from bisect import bisect_right, insort
+
+# Fix pathway
+module_path = os.path.abspath(os.path.join(''))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# Import functions
+import scripts.useful_functions as uf
+from scripts.stat_store import position_groups
+
+
+##################################################################################################################################
+''' Useful variables '''
+##################################################################################################################################
+# Number of players picked in each slot
+squad_slots = {
+    'front_row' : 3,
+    'second_row' : 2,
+    'back_row' : 3,
+    'half_backs' : 2,
+    'centres' : 2,
+    'back_three' : 3,
+}
+
+# Slot of each squad number. Replacements take the slot of the starter they usually cover
+slot_numbers = {x : slot for slot in squad_slots for x in position_groups[slot]}
+slot_numbers.update({16:'front_row', 17:'front_row', 18:'front_row', 19:'second_row', 20:'back_row', 21:'half_backs', 22:'centres', 23:'back_three'})
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Players to pick from
+def candidates(scores, values = ['total'], how = 'sum', prices = None):
+    '''
+        Purpose: To turn the scores of each player-match into one row per player to pick from
+        Inputs:
+            - scores = Scores of each player-match, e.g. fantasy_scores or fantasy_scores_rulesets (needs name, team & no. columns)
+            - values = List of the points columns to total up for each player
+            - how = How each player's points are totalled up across their matches, e.g. 'sum' or 'mean'
+            - prices = Dataframe of each player's price (name, team & price columns). If not specified, every player is free
+        Output: One row per player with their name, team, slot (from the squad number they wear most), points & price
+    '''
+    keys = ['name','team']
+
+    # Slot from the squad number each player wears most (the lowest number if there's a tie)
+    numbers = scores.groupby(keys+['no.'],observed=True).size().reset_index(name='matches')
+    numbers = numbers.sort_values(['matches','no.'],ascending=[False,True]).drop_duplicates(keys)
+    numbers['slot'] = [slot_numbers.get(x) for x in numbers['no.']]
+
+    # Total up the points & add the prices
+    df = scores.groupby(keys,observed=True)[values].agg(how).reset_index()
+    df = uf.join(df,keys,numbers[keys+['slot']],keys)
+    if prices is not None:
+        df = uf.join(df,keys,prices[keys+['price']],keys,out='left_join')
+    else:
+        df['price'] = 0.0
+    return df[df.slot.notnull()].reset_index(drop=True)
+
+# Drop the players that can never make the best squad
+def prune_dominated(df, value, slots, team_cap = None, cost = 'price'):
+    '''
+        Purpose: To drop the players that have enough better players (at least as many points for no more money) in their slot that one of
+                 them is always free to swap in, so the player can never be needed. That's as many better players as the slot has places, or
+                 with a team cap, as many from the player's own team, or better players from more teams than could be used up or full
+        Inputs:
+            - df = Candidates (see candidates)
+            - value = Points column to pick on
+            - slots = Dictionary of slot to number of players picked
+            - team_cap = Maximum number of players from one team. If not specified, no cap
+            - cost = Price column
+    '''
+    values, costs = df[value].to_numpy(dtype=float), df[cost].to_numpy(dtype=float)
+    teams = pd.factorize(df.team)[0]
+    full_teams = sum(slots.values()) // team_cap if team_cap != None else 0
+    keep = np.zeros(len(df),dtype=bool)
+    for slot, rows in df.groupby('slot',observed=True).indices.items():
+        places = slots.get(slot,0)
+        if places == 0:
+            continue
+
+        # Go through the slot best first (ties go to the player listed first), so everyone already seen has at least as many points
+        rows = rows[np.lexsort((costs[rows],-values[rows]))]
+        seen_costs = []
+        team_costs = {}
+        cheapest = np.full(teams.max()+1, np.inf)
+        for r in rows:
+            c, t = costs[r], teams[r]
+            if team_cap == None:
+                keep[r] = bisect_right(seen_costs,c) < places
+                insort(seen_costs,c)
+            else:
+                same_team = sum([x <= c for x in team_costs.get(t,[])])
+                keep[r] = same_team < places and (cheapest <= c).sum() < places + full_teams
+                team_costs.setdefault(t,[]).append(c)
+                cheapest[t] = min(cheapest[t],c)
+    return df[keep].reset_index(drop=True)
+
+# Best points from a list of players for every budget
+def knapsack_table(values, prices, picks, budget):
+    '''
+        Purpose: To work out the most points from exactly j of the players from the i-th player onwards costing at most b, for every i, j & b
+        Output: Array indexed [i, j, b], with -inf where it isn't possible
+    '''
+    n = len(values)
+    table = np.full((n+1,picks+1,budget+1), -np.inf)
+    table[:,0,:] = 0
+    for i in range(n-1,-1,-1):
+        table[i] = table[i+1]
+        p = prices[i]
+        if p <= budget:
+            table[i,1:,p:] = np.maximum(table[i+1,1:,p:], values[i] + table[i+1,:-1,:budget+1-p])
+    return table
+
+# Combine the best points of two groups of slots for every budget
+def combine_budgets(a, b):
+    '''
+        Purpose: To work out the most points from two groups of slots sharing a budget, given each one's most points for every budget
+    '''
+    out = np.full(len(a), -np.inf)
+    for spend in np.nonzero(a > -np.inf)[0]:
+        out[spend:] = np.maximum(out[spend:], a[spend] + b[:len(b)-spend])
+    return out
+
+# Price on each team's players that keeps the best squad within the team cap
+def team_prices(players, places, team_cap, n_teams, iterations = 200):
+    '''
+        Purpose: To find a price on picking each team's players so that, once the prices are taken off their points, the best squad (ignoring
+                 the budget) keeps within the team cap on its own. The squad's points with the team cap are then at most its points after the
+                 prices, plus the prices of the places each team has left under the cap, which bounds the search far tighter than ignoring
+                 the cap when the best players are bunched in a few teams. The prices are found by subgradient descent, keeping the tightest
+        Inputs:
+            - players = Each slot's players as (rows, points, prices, teams) arrays (see optimize)
+            - places = Number of players picked in each slot
+            - team_cap = Maximum number of players from one team
+            - n_teams = Number of teams
+            - iterations = Most steps to take
+        Output: Array of each team's price (0 for the teams the cap doesn't bind on)
+    '''
+    prices = np.zeros(n_teams)
+    best, best_prices = np.inf, prices
+    scale = np.std(np.concatenate([x[1] for x in players])) + 1e-9
+    for k in range(iterations):
+        # Best squad after the prices, ignoring the team cap & budget
+        counts = np.zeros(n_teams)
+        bound = team_cap * prices.sum()
+        for (_, values, _, team), n in zip(players,places):
+            adjusted = values - prices[team]
+            top = np.argpartition(-adjusted, n-1)[:n]
+            bound += adjusted[top].sum()
+            np.add.at(counts, team[top], 1)
+        if bound < best:
+            best, best_prices = bound, prices.copy()
+
+        # Stop once the squad keeps within the cap & only the full teams are priced, otherwise raise the price of the teams over the cap
+        slack = team_cap - counts
+        if (slack >= 0).all() and (prices * slack == 0).all():
+            break
+        prices = np.maximum(0, prices - scale / np.sqrt(k+1) * slack)
+    return best_prices
+
+# Pick the best squad
+def optimize(df, value = 'total', slots = squad_slots, team_cap = None, budget = None, unit = 0.5):
+    '''
+        Purpose: To pick the squad scoring the most points, filling every slot with at most team_cap players from one team and within budget
+        Inputs:
+            - df = Candidates (see candidates)
+            - value = Points column to pick on
+            - slots = Dictionary of slot to number of players picked
+            - team_cap = Maximum number of players from one team. If not specified, no cap
+            - budget = Most the squad can cost. If not specified, prices are ignored
+            - unit = Prices are rounded to the nearest unit, so the budget splits into budget/unit steps
+        Assumptions: Each player can only fill their own slot. Players without a price can't be picked when there's a budget
+        Output: The squad, slot by slot with the most points first in each
+    '''
+    # Prices in whole units
+    df = df[df[value].notnull() & (df.price.notnull() if budget != None else True)]
+    df = df.assign(units = np.round(df.price.to_numpy(dtype=float) / unit).astype(int) if budget != None else 0)
+    budget = int(np.floor(budget / unit + 1e-9)) if budget != None else 0
+    df = prune_dominated(df,value,slots,team_cap,'units')
+
+    # Each slot's players, best first
+    order = [x for x in slots if slots[x] > 0]
+    teams = {x : i for i, x in enumerate(pd.unique(df.team))}
+    players = []
+    for slot in order:
+        x = df[df.slot == slot].sort_values([value,'units'],ascending=[False,True],kind='stable')
+        if len(x) < slots[slot]:
+            raise ValueError(f"Not enough players to fill the {slot} slot ({len(x)} for {slots[slot]} places)")
+        players.append((x.index.to_numpy(), x[value].to_numpy(dtype=float), x.units.to_numpy(), np.array([teams[t] for t in x.team])))
+
+    # The knapsack table of each slot, and the most points the slots from each one onwards can add for every budget (ignoring the team cap)
+    def bounds(values):
+        tables = [knapsack_table(x,y[2],slots[slot],budget) for x, y, slot in zip(values,players,order)]
+        rest = [None] * len(order) + [np.zeros(budget+1)]
+        for s in range(len(order)-1,-1,-1):
+            rest[s] = combine_budgets(tables[s][0,slots[order[s]]],rest[s+1])
+        return tables, rest
+    tables, rest = bounds([x[1] for x in players])
+    if rest[0][budget] == -np.inf:
+        raise ValueError(f"No squad fits within the budget of {budget*unit}")
+
+    # The same with each team's price taken off its players' points, to bound the squads with the team cap (see team_prices)
+    prices = np.zeros(len(teams))
+    if team_cap != None:
+        prices = team_prices(players,[slots[x] for x in order],team_cap,len(teams))
+        priced_tables, priced_rest = bounds([x[1] - prices[x[3]] for x in players])
+
+    # Branch & bound: fill the slots in turn, trying each slot's players best first and stopping once the bound can't beat the best squad
+    best = {'points' : -np.inf, 'picks' : None}
+    picks = []
+    team_counts = np.zeros(len(teams),dtype=int)
+    def search(s, start, need, money, points, left):
+        # left = Prices of the places each team has left under the team cap
+        if need == 0:
+            if s + 1 == len(order):
+                if points > best['points']:
+                    best['points'], best['picks'] = points, list(picks)
+                return
+            return search(s+1, 0, slots[order[s+1]], money, points, left)
+        rows, values, units, team = players[s]
+        for i in range(start, len(rows)-need+1):
+            # Most points possible picking the rest of this slot from the i-th player onwards, then filling the other slots
+            bound = np.max(tables[s][i,need,:money+1] + rest[s+1][money::-1])
+            if team_cap != None:
+                bound = min(bound, np.max(priced_tables[s][i,need,:money+1] + priced_rest[s+1][money::-1]) + left)
+            if points + bound <= best['points'] + 1e-9:
+                break
+            if units[i] > money or (team_cap != None and team_counts[team[i]] >= team_cap):
+                continue
+            team_counts[team[i]] += 1
+            picks.append(rows[i])
+            search(s, i+1, need-1, money-units[i], points+values[i], left-prices[team[i]])
+            picks.pop()
+            team_counts[team[i]] -= 1
+    search(0, 0, slots[order[0]], budget, 0.0, team_cap*prices.sum() if team_cap != None else 0.0)
+    if best['picks'] == None:
+        raise ValueError(f"No squad fits within a team cap of {team_cap}")
+
+    # Output
+    squad = df.loc[best['picks']].drop(columns='units')
+    return squad.reset_index(drop=True)
+
+# Pick the best squad for a scenario
+def run_scenario(df, scenario, errors = 'raise'):
+    '''
+        Purpose: To pick the best squad for one scenario, e.g. in another process
+        Inputs:
+            - df = Candidates (see candidates)
+            - scenario = Dictionary of the optimize inputs (value, slots, team_cap, budget & unit) along with the scenario's name
+            - errors = What to do if no squad fits the scenario, options are:
+                - 'raise' (default) = Raise the error.
+                - 'skip' = Print the error and return no squad.
+    '''
+    try:
+        squad = optimize(df,**{x : y for x, y in scenario.items() if x != 'name'})
+    except ValueError as e:
+        if errors == 'raise':
+            raise
+        print(f"Skipping the {scenario.get('name')} scenario: {e}")
+        return None
+    squad.insert(0,'scenario',scenario.get('name'))
+    return squad
+
+# Pick the best squad for many scenarios
+def optimize_scenarios(df, scenarios, processes = None, errors = 'raise'):
+    '''
+        Purpose: To pick the best squad for each scenario (e.g. each rule set, team cap & budget), sharing the scenarios between processes
+        Inputs:
+            - errors = What to do with a scenario no squad fits (see run_scenario)
+        Output: The squads stacked together, with the scenario's name in the first column
+    '''
+    errors_options = ['raise','skip']
+    if errors_options.count(errors) != 1:
+        raise ValueError(f"'errors' input must be one of the following options: {', '.join(errors_options)}")
+    squads = uf.parallel_map(run_scenario,[[df,x,errors] for x in scenarios],processes)
+    return uf.concat_frames([x for x in squads if x is not None])
@@ -0,0 +1,271 @@
+'''
+    Filename: stat_store.py
+    Purpose: Hold the player-match stats (player_data, with each player's fantasy points) in memory with an index on each key, so questions
+             like "Ireland's forwards' tackles in the pool stage" or "one player's match history" are answered from the indexes rather
+             than by reloading & filtering the csvs.
+    Usage:
+        store = stat_store.load('data/rwc/2023/')
+        store.query(team='Ireland', position='forwards', round=(1,4), columns=['name','date','tackles'])
+        store.aggregate(['tackles','total'], by='name', team='Ireland', round=(1,4))
+        store.history('Johnny Sexton')
+'''
+
+##################################################################################################################################
+''' Importing packages and fixing pathway '''
+##################################################################################################################################
+# Import packages
+import os, sys
+import numpy as np
+import pandas as pd
+from bisect import bisect_left, bisect_right
+
+# Fix pathway
+module_path = os.path.abspath(os.path.join(''))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# Import functions
+import scripts.useful_functions as uf
+import scripts.storage as storage
+
+
+##################################################################################################################################
+''' Useful variables '''
+##################################################################################################################################
+# Columns that are indexed (the ones present in the dataset). round is each team's nth match of the tournament & season
+index_columns = ['name','team','opposition','date','round','no.','tournament','season']
+
+# Names the filters can be given by, for the columns that can't be used as keyword arguments
+filter_names = {'player' : 'name', 'no' : 'no.'}
+
+# Squad numbers making up each group of positions
+position_groups = {
+    'front_row' : [1,2,3],
+    'second_row' : [4,5],
+    'back_row' : [6,7,8],
+    'forwards' : [1,2,3,4,5,6,7,8],
+    'half_backs' : [9,10],
+    'centres' : [12,13],
+    'back_three' : [11,14,15],
+    'backs' : [9,10,11,12,13,14,15],
+    'starters' : list(range(1,16)),
+    'replacements' : list(range(16,24)),
+}
+
+# Keys of a player-match
+match_keys = ['date','team','opposition','name','no.']
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Add the round of each match
+def add_rounds(df):
+    '''
+        Purpose: To number each team's matches in date order (1 = their first match), per tournament & season if there's more than one
+    '''
+    group = [x for x in ['tournament','season','team'] if x in df.columns]
+    df['round'] = df.groupby(group,observed=True)['date'].rank(method='dense').astype('Int16')
+    return df
+
+# Indexed store of player-match stats
+class StatStore:
+    '''
+        Purpose: To answer filtered & aggregated lookups on player-match stats from an index on each key column
+        Assumptions: The store isn't changed once built, so the indexes never need updating
+        Inputs:
+            - df = Dataset of player stats, one row per player-match (e.g. player_data, optionally with a fantasy points 'total')
+    '''
+    def __init__(self, df):
+        self.data = df if 'round' in df.columns or 'date' not in df.columns else add_rounds(df.copy())
+        self.data = self.data.reset_index(drop=True)
+
+        # Each key's row positions (in order) for every value, the values sorted so ranges can be looked up, and each row's code
+        self.indexes = {}
+        self.keys = {}
+        self.codes = {}
+        self.code_of = {}
+        for col in [x for x in index_columns if x in self.data.columns]:
+            self.indexes[col] = self.data.groupby(col,observed=True,sort=False).indices
+            self.keys[col] = sorted(self.indexes[col])
+            self.codes[col] = pd.factorize(self.data[col],sort=True)
+            self.code_of[col] = {x : i for i, x in enumerate(self.codes[col][1])}
+
+        # Each column's array, so the rows asked for are taken from just the columns asked for
+        self.arrays = {x : self.data[x].array for x in self.data.columns}
+
+        # The numeric columns as float arrays (missing values as nan) to aggregate on
+        numeric = [x for x in self.data.columns if pd.api.types.is_numeric_dtype(self.data[x]) and not pd.api.types.is_bool_dtype(self.data[x])]
+        self.values = {x : self.data[x].to_numpy(dtype=float, na_value=np.nan) for x in numeric}
+
+    def __len__(self):
+        return len(self.data)
+
+    def match_keys(self, col, value):
+        '''
+            Purpose: To find the values of a key column that match a value
+            Inputs:
+                - col = Key column
+                - value = Value to match. A list matches any of its values, and a tuple of (start, end) matches the range between them
+                          (inclusive, with None leaving that end open)
+        '''
+        index, keys = self.indexes[col], self.keys[col]
+        clean = (lambda x: pd.Timestamp(x)) if col == 'date' else (lambda x: x)
+        if isinstance(value, tuple):
+            start, end = value
+            lo = 0 if start == None else bisect_left(keys,clean(start))
+            hi = len(keys) if end == None else bisect_right(keys,clean(end))
+            return keys[lo:hi]
+        return [x for x in [clean(x) for x in (value if isinstance(value, list) else [value])] if x in index]
+
+    def lookup(self, col, value):
+        '''
+            Purpose: To find the rows of one key column matching a value (see match_keys), from its index
+            Output: Array of row positions, in order
+        '''
+        found = [self.indexes[col][x] for x in self.match_keys(col,value)]
+        if len(found) == 0:
+            return np.array([],dtype=np.int64)
+        return found[0] if len(found) == 1 else np.sort(np.concatenate(found))
+
+    def rows(self, **filters):
+        '''
+            Purpose: To find the rows matching every filter. The rows are taken from the index of the filter matching the fewest rows,
+                     then narrowed down by checking the codes of the other filters' columns on just those rows
+            Inputs:
+                - **filters = Key column (or player, no & position) to value to match (see match_keys). position is the name of a group in
+                              position_groups, or a list of them. Filters set to None are ignored
+            Output: Array of row positions, in order
+        '''
+        matched = []
+        for col, value in filters.items():
+            if value is None:
+                continue
+            if col == 'position':
+                groups = value if isinstance(value, list) else [value]
+                if any([x not in position_groups for x in groups]):
+                    raise ValueError(f"'position' input must be one of the following options: {', '.join(position_groups)}")
+                col, value = 'no.', sorted(set(uf.flatten_list([position_groups[x] for x in groups])))
+            col = filter_names.get(col,col)
+            if col not in self.indexes:
+                raise ValueError(f"Filters must be from the following options: {', '.join(list(self.indexes) + list(filter_names) + ['position'])}")
+            keys = self.match_keys(col,value)
+            matched.append((sum([len(self.indexes[col][x]) for x in keys]), col, keys))
+        if len(matched) == 0:
+            return np.arange(len(self.data))
+
+        # Start from the filter matching the fewest rows
+        matched = sorted(matched, key=lambda x: x[0])
+        _, col, keys = matched[0]
+        rows = self.lookup(col,keys)
+        for _, col, keys in matched[1:]:
+            if len(rows) == 0:
+                break
+            codes = self.codes[col][0]
+            rows = rows[np.isin(codes[rows], [self.code_of[col][x] for x in keys])]
+        return rows
+
+    def query(self, columns = None, **filters):
+        '''
+            Purpose: To get the player-matches matching every filter
+            Inputs:
+                - columns = List of the columns to output. If not specified, all of them
+                - **filters = See rows
+            Output: The matching rows, in the order they're stored (indexed by their position in the store)
+        '''
+        return self.frame(self.rows(**filters),columns)
+
+    def frame(self, rows, columns = None):
+        '''
+            Purpose: To build a dataframe of the store's rows at the given positions
+        '''
+        columns = list(self.data.columns) if columns == None else columns
+        return pd.DataFrame({x : self.arrays[x][rows] for x in columns}, index=rows)
+
+    def aggregate(self, stats, by = None, how = 'sum', **filters):
+        '''
+            Purpose: To aggregate stats over the player-matches matching every filter
+            Inputs:
+                - stats = Stat or list of stats (numeric columns) to aggregate
+                - by = Key column to group by (e.g. 'name'). If not specified, the matching rows are aggregated together
+                - how = How to aggregate, options are:
+                    - 'sum' (default) = Total of each stat.
+                    - 'mean' = Average of each stat, ignoring missing values.
+                    - 'count' = Number of player-matches with each stat recorded.
+                    - 'min' = Lowest value of each stat.
+                    - 'max' = Highest value of each stat.
+                - **filters = See rows
+            Output: Series of each stat's aggregate, or a dataframe with one row per group if grouped
+        '''
+        # Check inputs
+        how_options = ['sum','mean','count','min','max']
+        if how_options.count(how) != 1:
+            raise ValueError(f"'how' input must be one of the following options: {', '.join(how_options)}")
+        stats = stats if isinstance(stats, list) else [stats]
+        if any([x not in self.values for x in stats]):
+            raise ValueError(f"{', '.join([x for x in stats if x not in self.values])} are not numeric columns in the store")
+        by = filter_names.get(by,by)
+        if by != None and by not in self.codes:
+            raise ValueError(f"'by' input must be one of the following options: {', '.join(self.codes)}")
+
+        # Group the matching rows, on the codes of the key column
+        rows = self.rows(**filters)
+        if by == None:
+            groups, labels = np.zeros(len(rows),dtype=np.int64), None
+        else:
+            codes, uniques = self.codes[by]
+            rows = rows[codes[rows] >= 0] # Rows missing the key aren't in any group
+            present, groups = np.unique(codes[rows], return_inverse=True)
+            labels = uniques.take(present)
+        n_groups = groups.max() + 1 if len(groups) > 0 else (1 if by == None else 0)
+
+        # Aggregate each stat
+        out = {}
+        for stat in stats:
+            values = self.values[stat][rows]
+            recorded = ~np.isnan(values)
+            counts = np.bincount(groups, weights=recorded, minlength=n_groups)
+            if how in ['sum','mean']:
+                totals = np.bincount(groups, weights=np.where(recorded,values,0), minlength=n_groups)
+                out[stat] = totals if how == 'sum' else np.divide(totals, counts, out=np.full(n_groups,np.nan), where=counts > 0)
+            elif how == 'count':
+                out[stat] = counts
+            else:
+                extreme = np.full(n_groups, np.inf if how == 'min' else -np.inf)
+                (np.minimum if how == 'min' else np.maximum).at(extreme, groups[recorded], values[recorded])
+                out[stat] = np.where(counts > 0, extreme, np.nan)
+
+        # Output
+        if by == None:
+            return pd.Series({x : y[0] for x, y in out.items()})
+        return pd.DataFrame(out, index=pd.Index(labels,name=by))
+
+    def history(self, player, team = None, columns = None):
+        '''
+            Purpose: To get a player's matches in date order
+        '''
+        rows = self.rows(player=player,team=team)
+        if 'date' in self.codes:
+            rows = rows[np.argsort(self.codes['date'][0][rows], kind='stable')]
+        return self.frame(rows,columns)
+
+# Build the store for a tournament & season
+def load(filepath, scores = True):
+    '''
+        Purpose: To build the stat store from the player_data saved in a partition (e.g. data/rwc/2023/)
+        Inputs:
+            - filepath = Directory the datasets are saved in
+            - scores = Add each player-match's fantasy points (as 'total') from fantasy_scores, if it's been saved
+    '''
+    df = storage.read_dataset('player_data',filepath)
+    if scores and storage.dataset_exists('fantasy_scores',filepath):
+        totals = storage.read_dataset('fantasy_scores',filepath,columns=match_keys+['total'])
+        df = uf.join(df,match_keys,totals,match_keys,out='left_join')
+    return StatStore(df)
+
+# Build the store across tournaments & seasons
+def load_partitions(tournaments = None, seasons = None, root = 'data/'):
+    '''
+        Purpose: To build the stat store from the player_data of every tournament & season asked for (see storage.read_partitions)
+    '''
+    return StatStore(storage.read_partitions('player_data',tournaments,seasons,root=root))
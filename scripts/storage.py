@@ -0,0 +1,126 @@
+'''
+    Filename: storage.py
+    Purpose: Read & write the datasets passed between the scripts as typed, compressed parquet files (with csv exports on the side).
+'''
+
+##################################################################################################################################
+''' Importing packages '''
+##################################################################################################################################
+# Import packages
+import os, sys
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Fix pathway
+module_path = os.path.abspath(os.path.join(''))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# The schema of each dataset is kept in schema.py
+from scripts.schema import dtypes, schemas, apply_schema, share_keys
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Location of a dataset
+def dataset_path(name, filepath, extension = 'parquet'):
+    return os.path.join(filepath, f'{name}.{extension}')
+
+# Check if a dataset has been saved
+def dataset_exists(name, filepath):
+    return os.path.exists(dataset_path(name,filepath)) or os.path.exists(dataset_path(name,filepath,'csv'))
+
+# Save a dataset
+def write_dataset(df, name, filepath, csv = False, metadata = None):
+    '''
+        Purpose: To save a dataset as a compressed parquet file, typed using the dataset's schema
+        Inputs:
+            - df = Dataset to save
+            - name = Name of the dataset (also the file name)
+            - filepath = Directory to save the dataset to
+            - csv = Also export the dataset as a csv
+            - metadata = Dictionary of text to save inside the parquet file (see read_metadata), so it's swapped in along with the rows
+    '''
+    # Write to a temporary file first then swap it in, so the dataset is never left half written
+    df = apply_schema(df,name)
+    path = dataset_path(name,filepath)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata != None:
+        table = table.replace_schema_metadata({**table.schema.metadata, **{x.encode() : y.encode() for x, y in metadata.items()}})
+    pq.write_table(table, f'{path}.tmp', compression='zstd')
+    os.replace(f'{path}.tmp', path)
+
+    # Export to csv
+    if csv:
+        export_csv(df, name, filepath)
+    return df
+
+# Read the metadata saved with a dataset
+def read_metadata(name, filepath):
+    '''
+        Purpose: To read the metadata saved inside a dataset's parquet file (see write_dataset), without reading any of its rows
+        Output: Dictionary of the metadata, empty if the dataset hasn't been saved as parquet
+    '''
+    path = dataset_path(name,filepath)
+    if not os.path.exists(path):
+        return {}
+    metadata = pq.read_schema(path).metadata or {}
+    return {x.decode() : y.decode() for x, y in metadata.items() if x != b'pandas'}
+
+# Export a dataset to csv
+def export_csv(df, name, filepath):
+    '''
+        Purpose: To export a dataset as a csv
+    '''
+    path = dataset_path(name,filepath,'csv')
+    df.to_csv(f'{path}.tmp',index=False)
+    os.replace(f'{path}.tmp', path)
+
+# Read a dataset
+def read_dataset(name, filepath, columns = None):
+    '''
+        Purpose: To read a dataset, only loading the columns needed
+        Inputs:
+            - name = Name of the dataset (also the file name)
+            - filepath = Directory the dataset is saved in
+            - columns = List of the columns to read. If not specified, all columns are read
+        Assumptions: If the dataset has only been saved as a csv (i.e. by an older version of the scripts), the csv is read instead
+    '''
+    # Parquet files are memory mapped, and only the columns asked for are read
+    path = dataset_path(name,filepath)
+    if os.path.exists(path):
+        return apply_schema(pq.read_table(path, columns=columns, memory_map=True).to_pandas(), name)
+
+    # Fall back to csv
+    df = pd.read_csv(dataset_path(name,filepath,'csv'), usecols=columns)
+    return apply_schema(df,name)
+
+# Read a dataset across tournaments & seasons
+def read_partitions(name, tournaments = None, seasons = None, columns = None, root = 'data/'):
+    '''
+        Purpose: To read a dataset from every tournament & season it's been saved for, only opening the partitions asked for
+        Inputs:
+            - name = Name of the dataset (also the file name)
+            - tournaments = List of the tournaments to read, e.g. ['rwc']. If not specified, all of them
+            - seasons = List of the seasons to read, e.g. ['2023']. If not specified, all of them
+            - columns = List of the columns to read. If not specified, all columns are read
+            - root = Directory the partitions are kept in, laid out as {root}/{tournament}/{season}/
+        Output: The partitions stacked together, with tournament & season columns added
+    '''
+    frames = []
+    for tournament in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        if tournaments != None and tournament not in tournaments:
+            continue
+        for season in sorted(os.listdir(os.path.join(root,tournament))) if os.path.isdir(os.path.join(root,tournament)) else []:
+            filepath = os.path.join(root,tournament,season)
+            if (seasons != None and season not in [str(x) for x in seasons]) or not dataset_exists(name,filepath):
+                continue
+            df = read_dataset(name,filepath,columns)
+            df.insert(0,'season',pd.Series([season]*len(df),dtype='string'))
+            df.insert(0,'tournament',pd.Series([tournament]*len(df),dtype='string'))
+            frames.append(df)
+    if len(frames) == 0:
+        raise FileNotFoundError(f"No partitions of '{name}' found in {root}")
+    return pd.concat([share_keys(x,name) for x in frames]).reset_index(drop=True)
@@ -0,0 +1,67 @@
+'''
+    Filename: tournaments.py
+    Purpose: Load the config of each tournament & season (urls, click xpaths, column maps...) and find where its data is kept.
+             Each tournament has a folder in scripts/ (e.g. scripts/rwc_2023/) with a config.json, and optionally its own
+             name_fixes.json, rulesets/ & prices.csv (each player's fantasy price). The rule set in rulesets/ named by the config's 'scoring'
+             is the tournament's points system. Its data is kept in data/{tournament}/{season}/.
+'''
+
+##################################################################################################################################
+''' Importing packages '''
+##################################################################################################################################
+# Import packages
+import os, sys, json
+from pathlib import Path
+
+
+##################################################################################################################################
+''' Useful variables '''
+##################################################################################################################################
+# Where the configs & data are kept
+config_root = 'scripts/'
+data_root = 'data/'
+
+# Tournament used when none is chosen
+default_tournament = 'rwc_2023'
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# List the tournaments with a config
+def list_tournaments():
+    return sorted([x.parent.name for x in Path(config_root).glob('*/config.json')])
+
+# Load a tournament's config
+def load_config(name = default_tournament):
+    '''
+        Purpose: To load a tournament's config
+        Inputs:
+            - name = Name of the tournament's folder in scripts/, e.g. 'rwc_2023'
+        Output: Dictionary of the config, with the tournament's name and the paths of its name fixes, rule sets & prices added
+    '''
+    path = os.path.join(config_root, name, 'config.json')
+    if not os.path.exists(path):
+        raise ValueError(f"No config for '{name}', tournaments must be from the following options: {', '.join(list_tournaments())}")
+    with open(path) as f:
+        config = json.load(f)
+    config['name'] = name
+    config.setdefault('name_fixes', os.path.join(config_root, name, 'name_fixes.json'))
+    config.setdefault('rulesets', os.path.join(config_root, name, 'rulesets/'))
+    config.setdefault('prices', os.path.join(config_root, name, 'prices.csv'))
+    return config
+
+# Tournament chosen when running a script
+def from_argv(argv = sys.argv):
+    '''
+        Purpose: To get the tournament chosen with --tournament=<name> when running a script (the default tournament if not chosen)
+    '''
+    chosen = [x.split('=',1)[1] for x in argv if x.startswith('--tournament=')]
+    return chosen[-1] if len(chosen) > 0 else default_tournament
+
+# Where a tournament's data is kept
+def partition_path(config, root = data_root):
+    '''
+        Purpose: To get the directory a tournament & season's data is kept in, i.e. data/{tournament}/{season}/
+    '''
+    return os.path.join(root, config['tournament'], str(config['season']), '')
@@ -7,94 +7,245 @@
 ''' Importing packages and fixing pathway '''
 ##################################################################################################################################
 # Import packages
+import numpy as np
 import pandas as pd
-import sys, os, itertools
-import chromedriver_autoinstaller
-from math import floor
-from rapidfuzz import fuzz
-from statistics import mean
-from bs4 import BeautifulSoup
-from selenium import webdriver 
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-
-
-# Set up selenium's chrome crawl
-chromedriver_autoinstaller.install()
-chrome_options = Options()
-chrome_options.headless = True
-chrome_options.add_argument("--headless")
-chrome_options.add_argument("--disable-gpu")
+import sys, os, itertools, json, importlib, hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 # Fix pathway
 module_path = os.path.abspath(os.path.join(''))
 if module_path not in sys.path:    
     sys.path.append(module_path)
 
+# Import functinos
+import scripts.storage as storage
+import scripts.schema as schema
+import scripts.metrics as metrics
+
+# The scraping functions live in web_scraping.py, which is only imported (along with selenium, bs4 & requests) the first time one is used
+scraping_names = [
+    'chrome_options', 'http_headers', 'launch_driver', 'scrape_page', 'http_session', 'http_scrape_page', 'make_soup',
+    'PageCache', 'scrape_stream', 'web_scrape', 'iter_scrape',
+]
+def __getattr__(name):
+    if name in scraping_names:
+        return getattr(importlib.import_module('scripts.web_scraping'), name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
 
 ##################################################################################################################################
 ''' Define class of functions '''
 ##################################################################################################################################
-# Scrape website
-def web_scrape(
-        url_list,
-        click = None,
-        options = chrome_options
-    ):
+# Run a function over a list of inputs in parallel
+def parallel_map(func, inputs, processes = None):
+    '''
+        Purpose: To run a function over a list of inputs using a pool of processes, keeping the outputs in the inputted order
+        Inputs:
+            - func = Function to run. Must be defined at the top level of a module so it can be sent to the other processes
+            - inputs = List of the arguments to call the function with (each one being a list of arguments)
+            - processes = Number of processes to use. If 1, everything runs in this process
+    '''
+    # No need to start processes for a single input
+    if processes == 1 or len(inputs) <= 1:
+        return [func(*x) for x in inputs]
+
+    # Share the inputs out between the processes
+    processes = min(processes if processes != None else os.cpu_count(), len(inputs))
+    chunksize = max(len(inputs) // (processes * 4), 1)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(func, *zip(*inputs), chunksize=chunksize))
+
+# Run a function over a stream of inputs in parallel
+def parallel_imap(func, inputs, processes = None):
+    '''
+        Purpose: To run a function over a stream of inputs using a pool of processes, yielding the outputs in the inputted order
+        Assumptions: Only a couple of inputs per process are waiting at once, so the inputs can be read lazily from a generator
+        Inputs:
+            - func = Function to run. Must be defined at the top level of a module so it can be sent to the other processes
+            - inputs = Iterable of the arguments to call the function with (each one being a list of arguments)
+            - processes = Number of processes to use. If 1, everything runs in this process
+    '''
+    # Run in this process
+    processes = processes if processes != None else os.cpu_count()
+    if processes == 1:
+        for x in inputs:
+            yield func(*x)
+        return
+
+    # Keep the pool topped up, handing back the oldest output once enough are waiting
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = deque()
+        for x in inputs:
+            pending.append(pool.submit(func, *x))
+            if len(pending) >= 2*processes:
+                yield pending.popleft().result()
+        while len(pending) > 0:
+            yield pending.popleft().result()
+
+# Load the manifest of fixtures in a dataset
+def load_manifest(path, excluded = {}, name = None, filepath = None):
     '''
-        Purpose: To scrape the webpages of the inputted urls
-        Assumptions: We'll repeat the click for each url
+        Purpose: To load the manifest of the fixtures that have already been ingested into a dataset
+        Inputs:
+            - path = Location of the manifest (json)
+            - excluded = Fixtures to never scrape along with the reason why (from the tournament's config). These are never saved in the manifest,
+                         so a change to the config applies on the next run
+            - name = Name of the dataset. If given, the fixtures saved inside the dataset (see save_ingested) are used as the ingested
+                     fixtures, as they're always in step with its rows
+            - filepath = Directory the dataset is saved in
+        Output: Dictionary with the list of 'ingested' fixtures and the 'excluded' fixtures
+    '''
+    manifest = {'ingested' : [], 'excluded' : dict(excluded)}
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest['ingested'] = json.load(f).get('ingested',[])
+    metadata = storage.read_metadata(name,filepath) if name != None else {}
+    if 'ingested' in metadata:
+        manifest['ingested'] = json.loads(metadata['ingested'])
+    return manifest
+
+# Find the fixtures that still need scraping
+def new_fixtures(fixtures, manifest):
+    '''
+        Purpose: To filter a list of fixture urls down to the ones that aren't ingested or excluded in the manifest
     '''
-    # Depends on number of calls required we might need to relaunch the webdriver a few times
-    calls_per_url = len(click) if click != None else 1
-    url_list = url_list if isinstance(url_list,list) else [url_list]
-    url_list = break_list(url_list,floor(100/calls_per_url))
-
-    # Loop through the list of urls
-    soups = []
-    for urls in url_list:
-        # Launch chrome
-        driver = webdriver.Chrome(options=options)
-        driver.implicitly_wait(60)
-
-        # Loop through the urls
-        for url in urls:
-            # Access url
-            print(f'    - Scraping {url}')
-            driver.get(url)
-
-            # Scrape using beautiful soup
-            html = driver.page_source
-            soup = BeautifulSoup(html, 'html.parser')
-
-            # If we need to click some buttons
-            if click != None:
-                click = click if isinstance(click,list) else [click]
-                pages = []
-
-                # Loop through each button that needs clicking and scrape the updated page
-                for button in click:
-                    # Click the button
-                    l = driver.find_element(By.XPATH,button)
-                    driver.execute_script("arguments[0].click();", l)
-
-                    # Scrape the page
-                    html = driver.page_source
-                    pages = pages + [BeautifulSoup(html, 'html.parser')]
-                
-                # Add to output list
-                soups = soups + [[soup,pages]]
-            else:
-                soups = soups + [soup]
-
-        # Close driver
-        driver.close()
+    ingested = set(manifest['ingested'])
+    return [x for x in fixtures if x not in ingested and not any([y in x for y in manifest['excluded']])]
 
-    # Output
-    if len(soups) == 1:
-        return soups[0]
-    else:
-        return soups
+# Save a dataset along with its manifest
+def save_ingested(df, name, filepath, fixtures, manifest, manifest_path, keys = None, append = False):
+    '''
+        Purpose: To save a scraped dataset along with the manifest of the fixtures in it, keeping the two in step
+        Inputs:
+            - df = Dataset of the scraped fixtures
+            - name = Name of the dataset (see schema.schemas)
+            - filepath = Directory the dataset is saved in
+            - fixtures = List of the fixtures in df
+            - manifest = Manifest of the fixtures already in the dataset
+            - manifest_path = Location of the manifest (json)
+            - keys = Columns identifying each row (e.g. a player in a match). When appending, a row with the same keys as one already in the
+                     dataset replaces it, so fixtures that are ingested again (e.g. the manifest was lost) aren't duplicated
+            - append = Append to the existing dataset and manifest, otherwise both are overwritten
+    '''
+    # Add to what's already been ingested
+    if append and storage.dataset_exists(name,filepath):
+        df = pd.concat([storage.read_dataset(name,filepath),storage.apply_schema(df,name)]).reset_index(drop=True)
+        if keys != None:
+            df = df.drop_duplicates(keys,keep='last').reset_index(drop=True)
+        fixtures = manifest['ingested'] + [x for x in fixtures if x not in manifest['ingested']]
+    manifest = {'ingested' : fixtures}
+
+    # The fixtures are saved inside the dataset, so they're swapped in along with its rows (see load_manifest), then the manifest is
+    # swapped in after it
+    storage.write_dataset(df,name,filepath,metadata={'ingested' : json.dumps(fixtures)})
+    with open(f'{manifest_path}.tmp','w') as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+
+# Checkpoints of the fixtures parsed so far
+class Checkpoint:
+    '''
+        Purpose: To save each fixture's parsed data as soon as it's ready, so an interrupted scrape picks up where it stopped rather than starting over.
+                 Checkpoints are cleared once the dataset they make up has been saved
+        Inputs:
+            - path = Directory to keep the checkpoints in
+    '''
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def file(self, fixture):
+        # Fixtures are addressed by a hash of their url
+        return os.path.join(self.path, f"{hashlib.sha256(fixture.encode('utf-8')).hexdigest()}.pkl")
+
+    def completed(self, fixtures):
+        '''
+            Purpose: To filter a list of fixtures down to the ones with a checkpoint
+        '''
+        return [x for x in fixtures if os.path.exists(self.file(x))]
+
+    def save(self, fixture, df):
+        # Written to a temporary file first then swapped in, so a checkpoint is never left half written
+        file = self.file(fixture)
+        df.to_pickle(f'{file}.{os.getpid()}.tmp')
+        os.replace(f'{file}.{os.getpid()}.tmp', file)
+
+    def run(self, fixture, func, *args):
+        '''
+            Purpose: To parse a fixture and save its checkpoint, e.g. in the process that parsed it
+        '''
+        df = func(*args)
+        self.save(fixture, df)
+        return df
+
+    def load(self, fixtures):
+        '''
+            Purpose: To load the parsed data of each fixture with a checkpoint
+        '''
+        return [pd.read_pickle(self.file(x)) for x in self.completed(fixtures)]
+
+    def clear(self):
+        for x in os.listdir(self.path):
+            os.remove(os.path.join(self.path, x))
+
+# Collect rows for a dataframe
+class RecordBuilder:
+    '''
+        Purpose: To collect rows one at a time and build the dataframe once at the end, rather than growing a dataframe row by row
+        Inputs:
+            - columns = List of column names. If not specified, they're taken from the first row added (which must be a dict)
+    '''
+    def __init__(self, columns = None):
+        self.columns = None
+        self.data = None
+        if columns != None:
+            self.set_columns(columns)
+
+    def set_columns(self, columns):
+        # Each column is kept as its own list (by position, so duplicate column names are fine)
+        self.columns = list(columns)
+        self.data = [[] for _ in self.columns]
+
+    def add(self, row):
+        '''
+            Purpose: To add a row, either as a list in column order or as a dict of column names to values
+        '''
+        if isinstance(row, dict):
+            if self.columns == None:
+                self.set_columns(row.keys())
+            row = [row.get(x) for x in self.columns]
+        if len(row) != len(self.columns):
+            raise ValueError(f"Row has {len(row)} values but there are {len(self.columns)} columns")
+        for values, value in zip(self.data, row):
+            values.append(value)
+
+    def __len__(self):
+        return len(self.data[0]) if self.data else 0
+
+    def to_frame(self):
+        '''
+            Purpose: To build the dataframe from the collected rows
+        '''
+        if self.columns == None:
+            return pd.DataFrame()
+        df = pd.DataFrame(dict(enumerate(self.data)), columns=range(len(self.columns)))
+        df.columns = self.columns
+        return df
+
+# Combine a list of dataframes
+def concat_frames(frames):
+    '''
+        Purpose: To combine a list of dataframes in one go, returning an empty dataframe if the list is empty
+    '''
+    return pd.concat(frames).reset_index(drop=True) if len(frames) > 0 else pd.DataFrame()
+
+# Index the key columns of a dataframe
+def key_index(df, cols):
+    '''
+        Purpose: To index the key columns of a dataframe. Pass it into join when the same dataframe is joined repeatedly, so it's only built once
+    '''
+    return pd.MultiIndex.from_frame(df[cols])
 
 # Generally useful function
 def join(
@@ -103,6 +254,8 @@ def join(
         right : pd.DataFrame,
         rcols = [],
         out = "join",
+        lindex = None,
+        rindex = None,
     ):
     '''
         Purpose: To join two dataframes together based on chosen columns
@@ -118,66 +271,40 @@ def join(
                 - 'left_join' = Combination of 'left' and 'join'.
                 - 'right_join' = Combination of 'right' and 'join'.
                 - 'all' = Combination of 'join', 'left' & 'right'
+            - lindex = Prebuilt key_index(left, lcols), only used by 'left' & 'right'. If not specified, it's built here
+            - rindex = Prebuilt key_index(right, rcols), only used by 'left' & 'right'. If not specified, it's built here
+        Assumptions: The inputs aren't copied, the output is always a new dataframe
     '''
     # Add errors for incorrect inputs
-    # if isinstance(left,pd.DataFrame) or isinstance(left):
-    #     raise ValueError(f"'left' input must be a pandas dataframe. Type = {type(left)}")
-    # if isinstance(right, pd.DataFrame):
-    #     raise ValueError("'right' input must be a pandas dataframe")
-    # if isinstance(lcols, list):
-    #     raise ValueError("'lcols' input must be a list")
-    # if isinstance(rcols, list):
-    #     raise ValueError("'rcols' input must be a list")
     output_options = ['join','left','right','left_join','right_join','all']
     if output_options.count(out) != 1:
         raise ValueError(f"'out' input must be one of the following options: {', '.join(output_options)}")
 
     # Check if the columns selected are valid
-    if mean([left.columns.tolist().count(x) for x in lcols]) != 1:
-        raise ValueError(f"{', '.join([x for x in lcols if left.columns.tolist().count(x) != 1])} are not columns in 'lcols'")
+    columns = set(left.columns)
+    if any([x not in columns for x in lcols]):
+        raise ValueError(f"{', '.join([x for x in lcols if x not in columns])} are not columns in 'lcols'")
     rcols = lcols if rcols == [] else rcols # If only one list of column names has been specified, update rcols to equal lcols
-    if mean([right.columns.tolist().count(x) for x in rcols]) != 1:
-        raise ValueError(f"{', '.join([x for x in rcols if right.columns.tolist().count(x) != 1])} are not columns in 'rcols'")
-
-    # Create copies of the inputted datasets
-    l = left.copy(deep=True).reset_index(drop=True)
-    r = right.copy(deep=True).reset_index(drop=True)
-
-    # If selected output is 'join', enact merge
-    if out == "join":
-        df = l.merge(r,left_on=lcols,right_on=rcols)
-
-    # If selected output is 'left', enact merge
-    elif out == "left":
-        # Add a unique ID column called "dummy_col"
-        l.index = l.index.set_names(["dummy_col"])
-        l = l.reset_index()
-        # Do a full merge and a left merge then use the unique ID to spot the missing columns
-        df_merged = l.merge(r,left_on=lcols,right_on=rcols)
-        rows = list(set(l["dummy_col"]) - set(df_merged["dummy_col"]))
-        df = l[l["dummy_col"].isin(rows)].drop(columns="dummy_col")
-
-    # If selected output is 'right', enact merge
-    elif out == "right":
-        # Add a unique ID column called "dummy_col"
-        r.index = r.index.set_names(["dummy_col"])
-        r = r.reset_index()
-        # Do a full merge and a left merge then use the unique ID to spot the missing columns
-        df_merged = l.merge(r,left_on=lcols,right_on=rcols)
-        rows = list(set(r["dummy_col"]) - set(df_merged["dummy_col"]))
-        df = r[r["dummy_col"].isin(rows)].drop(columns="dummy_col")
-
-    # If selected output is 'left_join', enact merge
-    elif out == "left_join":
-        df = l.merge(r,left_on=lcols,right_on=rcols,how="left")
-
-    # If selected output is 'right_join', enact merge
-    elif out == "right_join":
-        df = l.merge(r,left_on=lcols,right_on=rcols,how="right")
-
-    # If selected output is 'all', enact merge
-    elif out == "all":
-        df = l.merge(r,left_on=lcols,right_on=rcols,how="outer")
+    columns = set(right.columns)
+    if any([x not in columns for x in rcols]):
+        raise ValueError(f"{', '.join([x for x in rcols if x not in columns])} are not columns in 'rcols'")
+
+    # Categorical keys (e.g. team & player names) are matched on their codes, which needs the same categories on both sides
+    left, right = schema.align_keys(left,lcols,right,rcols)
+
+    # If selected output is 'left' or 'right', keep the records whose keys aren't in the other input's keys
+    if out in ["left","right"]:
+        lindex = key_index(left,lcols) if lindex is None else lindex
+        rindex = key_index(right,rcols) if rindex is None else rindex
+        if out == "left":
+            df = left[~lindex.isin(rindex)]
+        else:
+            df = right[~rindex.isin(lindex)]
+
+    # Otherwise enact merge
+    else:
+        how = {'join':'inner', 'left_join':'left', 'right_join':'right', 'all':'outer'}[out]
+        df = left.merge(right,left_on=lcols,right_on=rcols,how=how)
     
     # Output
     return df.reset_index(drop=True)
@@ -202,6 +329,14 @@ def name_fix(df,col,mapping,col_new=False):
 
 # Define function to matching up
 def matching(df1, df2, threshold = 90):
+    '''
+        Purpose: To match up the players in two dataframes on their name_link & team, fuzzy matching the names that don't match exactly
+        Inputs:
+            - df1 = First dataframe, must have 'name_link' & 'team' columns
+            - df2 = Second dataframe, must have 'name_link' & 'team' columns
+            - threshold = Score (from fuzz.ratio) a pair of names has to beat to be fuzzy matched
+        Output: The exact matches, followed by the fuzzy matches, followed by the rows from either side that didn't match
+    '''
     # Definve vars
     on = ["name_link","team"]
 
@@ -209,36 +344,137 @@ def matching(df1, df2, threshold = 90):
     df = join(df1,on,df2,on)
 
     # Misses
-    df_left = join(df1,on,df2,on,out='left')
-    df_left['link'] = 1
-    df_right = join(df1,on,df2,on,out='right')
-    df_right['link'] = 1
-
-    # Fuzzy match
-    df_fuzzy = pd.DataFrame()
-    for x in df_left.name_link:
-        team = df_left[df_left.name_link == x].team.values[0]
-        for y in df_right[df_right.team == team].name_link:
-            if fuzz.ratio(x,y) > threshold:
-                # If there's a match, join up
-                fuzz1 = df_left[df_left.name_link == x].reset_index(drop=True)
-                fuzz2 = df_right[df_right.name_link == y].reset_index(drop=True)
-                on2 = ['link','team']
-                fuzz_match = join(fuzz1,on2,fuzz2,on2)
-                # Add to fuzzy list
-                df_fuzzy = pd.concat([df_fuzzy, fuzz_match])
-                # Remove from missing list
-                df_left = df_left[df_left.name_link != x].reset_index(drop=True)
-                df_right = df_right[df_right.name_link != y].reset_index(drop=True)
-    # Keep left name_link
-    if df_fuzzy.shape != (0,0):
-        #print(df_fuzzy)
-        df_fuzzy = df_fuzzy.drop(columns='name_link_y').rename(columns={'name_link_x':'name_link'}).drop(columns='link').reset_index(drop=True)
+    index1, index2 = key_index(df1,on), key_index(df2,on)
+    df_left = join(df1,on,df2,on,out='left',lindex=index1,rindex=index2)
+    df_right = join(df1,on,df2,on,out='right',lindex=index1,rindex=index2)
+
+    # Fuzzy match within each team, scoring every pair of names in the team at once (only imported when there's fuzzy matching to do)
+    from rapidfuzz import fuzz, process
+    from scipy.optimize import linear_sum_assignment
+    left_rows, right_rows = [], []
+    right_teams = df_right.groupby('team',observed=True).indices
+    with metrics.recorder.timer('fuzzy_matching', names=len(df_left)):
+        for team, lrows in df_left.groupby('team',observed=True).indices.items():
+            rrows = right_teams.get(team)
+            if rrows is None:
+                continue
+            scores = process.cdist(df_left.name_link.iloc[lrows].tolist(), df_right.name_link.iloc[rrows].tolist(), scorer=fuzz.ratio)
+            scores = np.where(scores > threshold, scores, 0)
+
+            # Pair the names up so the total score across the team is as high as possible (each name being used at most once)
+            li, ri = linear_sum_assignment(scores, maximize=True)
+            keep = scores[li,ri] > 0
+            left_rows = left_rows + lrows[li[keep]].tolist()
+            right_rows = right_rows + rrows[ri[keep]].tolist()
+    metrics.recorder.count('exact_matches',len(df))
+    metrics.recorder.count('fuzzy_matches',len(left_rows))
+
+    # Join up the fuzzy matches, keeping the left name_link
+    fuzz1 = df_left.iloc[left_rows].reset_index(drop=True)
+    fuzz2 = df_right.iloc[right_rows].drop(columns=on).reset_index(drop=True)
+    df_fuzzy = fuzz1.join(fuzz2, lsuffix='_x', rsuffix='_y')
+
+    # Remove from missing list
+    df_left = df_left.drop(index=df_left.index[left_rows])
+    df_right = df_right.drop(index=df_right.index[right_rows])
 
     # Merge and output
-    df_missing = pd.concat([df_left,df_right]).drop(columns='link').reset_index(drop=True)
+    df_missing = pd.concat([df_left,df_right]).reset_index(drop=True)
     return pd.concat([df, df_fuzzy,df_missing]).reset_index(drop=True)
 
+# Persistent index of player aliases
+class AliasStore:
+    '''
+        Purpose: To keep a persistent index of the name each source uses for a player, so a name only ever needs matching up once
+        Assumptions: A player's ID is the name the RWC website uses for them, so IDs are only unique within a team
+        Inputs:
+            - path = Location of the index (csv with the columns source, team, raw_name, player_id & fix, the name fix the alias was matched
+                     up under)
+            - fixes = Dictionary of source to manual name fixes, applied to names before they're fuzzy matched
+    '''
+    columns = ['source','team','raw_name','player_id','fix']
+
+    def __init__(self, path, fixes = {}):
+        self.path = path
+        self.fixes = fixes
+        self.aliases = {}
+        self.fixed = {}
+        if os.path.exists(path):
+            df = pd.read_csv(path, dtype=str, keep_default_na=False)
+            fixed = df.fix if 'fix' in df.columns else df.raw_name # Older indexes didn't keep the fixes, so assume none were used
+            self.aliases = {(a,b,c) : d for a,b,c,d in zip(df.source,df.team,df.raw_name,df.player_id)}
+            self.fixed = {(a,b,c) : d for a,b,c,d in zip(df.source,df.team,df.raw_name,fixed)}
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def get(self, source, team, raw_name):
+        '''
+            Purpose: To look up the player ID for a name. Returns None for names that haven't been seen,
+            and '' for names that have been seen but don't belong to a player in that team
+        '''
+        return self.aliases.get((source,team,raw_name))
+
+    def add(self, source, team, raw_name, player_id):
+        self.aliases[(source,team,raw_name)] = player_id
+        self.fixed[(source,team,raw_name)] = self.fix(source,raw_name)
+
+    def fix(self, source, raw_name):
+        return self.fixes.get(source,{}).get(raw_name,raw_name)
+
+    def refresh(self):
+        '''
+            Purpose: To drop the aliases matched up under a name fix that has since been changed, so they're matched up again with the new fix.
+                     If an RWC name's fix has changed, the other sources' names matched up to that player are dropped too
+            Output: Number of aliases dropped
+        '''
+        stale = set([x for x in self.aliases if self.fixed.get(x,x[2]) != self.fix(x[0],x[2])])
+        players = set([(team,self.aliases[(source,team,raw_name)]) for source, team, raw_name in stale if source == 'rwc'])
+        dropped = [x for x in self.aliases if x in stale or (x[0] != 'rwc' and (x[1],self.aliases[x]) in players)]
+        for x in dropped:
+            del self.aliases[x]
+            self.fixed.pop(x,None)
+        return len(dropped)
+
+    def claimed(self, source):
+        '''
+            Purpose: To find the players (as team & player ID) that already have a name from a source, so no other name from it is matched to them
+        '''
+        return set([(team,player_id) for (s,team,raw_name), player_id in self.aliases.items() if s == source and player_id != ''])
+
+    def unseen(self, df, source, name_col, team_col = 'team', retry = []):
+        '''
+            Purpose: To filter a dataframe down to the rows with names that aren't in the index yet, along with the names that couldn't be
+                     matched up before (stored as '') in the teams to retry, e.g. the teams with new players they could match up to
+        '''
+        return df[[self.aliases.get((source,team,name),'') == '' and ((source,team,name) not in self.aliases or team in retry)
+                   for team, name in zip(df[team_col],df[name_col])]]
+
+    def seed(self, lookup, sources = ['rwc','espn','wiki']):
+        '''
+            Purpose: To add the names from a previous player lookup (with name_<source> & team columns) to the index
+        '''
+        for source in sources:
+            rows = lookup[[f'name_{source}','team','name_rwc']].dropna()
+            for raw_name, team, player_id in zip(rows[f'name_{source}'],rows.team,rows.name_rwc):
+                if (source,team,raw_name) not in self.aliases:
+                    self.add(source,team,raw_name,player_id)
+
+    def frame(self, source):
+        '''
+            Purpose: To get the names of one source that belong to a player, as a dataframe of team, raw_name & player_id
+        '''
+        rows = [[team,raw_name,player_id] for (s,team,raw_name), player_id in self.aliases.items() if s == source and player_id != '']
+        return pd.DataFrame(rows, columns=['team','raw_name','player_id'])
+
+    def save(self):
+        '''
+            Purpose: To save the index, writing to a temporary file first so it's never left half written
+        '''
+        df = pd.DataFrame([list(k) + [v,self.fixed.get(k,k[2])] for k, v in self.aliases.items()], columns=self.columns)
+        df.to_csv(f'{self.path}.tmp',index=False)
+        os.replace(f'{self.path}.tmp',self.path)
+
 # Trailing zero
 def trailing_zero(num):
     out = str(num) if len(num) == 2 else '0' + str(num)
@@ -0,0 +1,582 @@
+'''
+    Filename: web_scraping.py
+    Purpose: The scraping backend (chrome drivers, http sessions & the page cache), kept apart from useful_functions.py
+             so the scripts that only analyse the scraped data don't need chrome, selenium or a network connection.
+'''
+
+##################################################################################################################################
+''' Importing packages and fixing pathway '''
+##################################################################################################################################
+# Import packages
+import sys, os, queue, threading, json, gzip, time, hashlib
+from collections import deque
+import requests
+import psutil
+import chromedriver_autoinstaller
+from math import floor
+from pathlib import Path
+from urllib.parse import urlparse
+from selenium import webdriver 
+from selenium.webdriver.common.by import By
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from requests.adapters import HTTPAdapter
+
+
+# Set up selenium's chrome crawl (chromedriver itself is only installed when the first driver is launched)
+chrome_options = Options()
+chrome_options.headless = True
+chrome_options.add_argument("--headless")
+chrome_options.add_argument("--disable-gpu")
+driver_installed = False
+install_lock = threading.Lock()
+
+# Faster chrome profile: hand the page over as soon as its html is parsed (rather than once every image, font & script has loaded),
+# never load images, and block the resources listed in blocked_resources
+fast_options = Options()
+fast_options.add_argument("--headless")
+fast_options.add_argument("--disable-gpu")
+fast_options.page_load_strategy = 'eager'
+fast_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+# Resources the scrapers never need (images, fonts, media, ads & tracking), blocked through the devtools protocol
+blocked_resources = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.mp4', '*.webm', '*.m3u8',
+    '*doubleclick.net*', '*googlesyndication.com*', '*google-analytics.com*', '*googletagmanager.com*',
+    '*facebook.net*', '*scorecardresearch.com*', '*adsystem*', '*hotjar*', '*optimizely*',
+]
+
+# Headers sent with plain http requests (some sites, e.g. wikipedia, refuse requests without a user agent)
+http_headers = {'User-Agent': 'Mozilla/5.0 (compatible; rugby-scraper/1.0)'}
+
+# Fix pathway
+module_path = os.path.abspath(os.path.join(''))
+if module_path not in sys.path:    
+    sys.path.append(module_path)
+
+# Import functinos
+import scripts.metrics as metrics
+from scripts.parsing import make_soup
+
+
+##################################################################################################################################
+''' Define class of functions '''
+##################################################################################################################################
+# Install chromedriver
+def install_driver():
+    '''
+        Purpose: To install the chromedriver matching the installed chrome, the first time it's needed
+    '''
+    global driver_installed
+    with install_lock:
+        if not driver_installed:
+            chromedriver_autoinstaller.install()
+            driver_installed = True
+
+# Launch a chrome driver
+def launch_driver(options = chrome_options, blocked = None, implicit_wait = 60):
+    '''
+        Purpose: To launch a headless chrome driver ready for scraping
+        Inputs:
+            - options = Chrome options to launch with
+            - blocked = List of url patterns (e.g. '*.png') the driver never loads. If not specified, nothing is blocked
+            - implicit_wait = Seconds to wait for elements that aren't there yet. None when using explicit waits (see scrape_page)
+    '''
+    install_driver()
+    with metrics.recorder.timer('driver_launch'):
+        driver = webdriver.Chrome(options=options)
+        if implicit_wait != None:
+            driver.implicitly_wait(implicit_wait)
+        driver.execute_cdp_cmd('Performance.enable', {})
+        if blocked != None:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked})
+    return driver
+
+# Close a driver
+def quit_driver(driver):
+    '''
+        Purpose: To close a driver, even one that has crashed (which can't be closed cleanly)
+    '''
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+# Check a driver still responds
+def driver_alive(driver):
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+# Memory used by a driver
+def driver_memory(driver):
+    '''
+        Purpose: To measure the memory (in bytes) of the driver, as the resident memory of chromedriver's process and every process under it
+                 (chrome, its renderers, gpu process etc.), which is where a leaking driver's memory goes rather than the javascript heap
+        Output: Bytes in use, or None if the driver's process can't be found
+    '''
+    try:
+        process = psutil.Process(driver.service.process.pid)
+        processes = [process] + process.children(recursive=True)
+    except (AttributeError, psutil.Error):
+        return None
+
+    # Processes can exit while they're being measured
+    memory = 0
+    for x in processes:
+        try:
+            memory += x.memory_info().rss
+        except psutil.Error:
+            continue
+    return memory
+
+# Javascript returning the html of the element a css selector points to (or of the whole page if there's no such element)
+container_script = '''
+    var element = document.querySelector(arguments[0]);
+    return element ? element.outerHTML : document.documentElement.outerHTML;
+'''
+
+# Scrape a single webpage
+def scrape_page(driver, url, click = None, container = None, wait_for = None, timeout = 60):
+    '''
+        Purpose: To scrape the webpage of one url using an already launched driver
+        Inputs:
+            - driver = Selenium webdriver to load the page with
+            - url = Webpage to scrape
+            - click = List of xpaths to click on, scraping the updated page after each click
+            - container = Css selector (or list of them, one per click) of the element that changes after each click. If specified, only
+                          that element's html is taken after each click, rather than the whole page
+            - wait_for = Css selector of an element to wait for before taking the page's html. If not specified, the page is taken once loaded
+            - timeout = Seconds to wait for the element, each button & each container before giving up
+        Output: List of the page's html, followed by the html of the page (or container) after each click
+    '''
+    # Access url, waiting for the part of the page that's needed
+    print(f'    - Scraping {url}')
+    with metrics.recorder.timer('fetch', url=url, backend='chrome'):
+        driver.get(url)
+        if wait_for != None:
+            WebDriverWait(driver,timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR,wait_for)))
+        htmls = [driver.page_source]
+
+    # Loop through each button that needs clicking and scrape the updated page
+    click = click if click != None else []
+    containers = container if isinstance(container,list) else [container] * len(click)
+    for button, selector in zip(click,containers):
+        with metrics.recorder.timer('click', url=url, button=button):
+            # Click the button once it's there
+            l = WebDriverWait(driver,timeout).until(EC.presence_of_element_located((By.XPATH,button)))
+            driver.execute_script("arguments[0].click();", l)
+
+            # Scrape the page, or just the part of it that's changed
+            if selector != None:
+                WebDriverWait(driver,timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR,selector)))
+            htmls = htmls + [driver.page_source if selector == None else driver.execute_script(container_script,selector)]
+
+    # Output
+    return htmls
+
+# Create a http session
+def http_session(pool_size = 1, headers = http_headers):
+    '''
+        Purpose: To create a requests session that keeps its connections alive and pools them between threads
+    '''
+    session = requests.Session()
+    session.headers.update(headers)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# Scrape a single static webpage
+def http_scrape_page(session, url, timeout = 60):
+    '''
+        Purpose: To scrape the webpage of one url with a plain http request (no javascript is ran)
+        Output: List containing the page's html
+    '''
+    # Access url
+    print(f'    - Scraping {url}')
+    with metrics.recorder.timer('fetch', url=url, backend='http'):
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+    return [response.text]
+
+# On-disk cache of scraped pages
+class PageCache:
+    '''
+        Purpose: To store the html scraped for each url (and each page after clicking) on disk, so pages aren't scraped again
+        Inputs:
+            - path = Directory to keep the cached pages in
+            - ttl = Number of seconds a cached page stays valid for. If not specified, pages never expire
+            - max_size = Maximum size of the cache in bytes, the least recently used pages are removed past this. If not specified, no cap
+            - mode = How the cache is used, options are:
+                - 'use' (default) = Read pages from the cache, scraping and saving the ones that are missing.
+                - 'refresh' = Always scrape the pages, saving them over the cached copies.
+                - 'replay' = Only read pages from the cache, never scraping. Missing pages raise a KeyError.
+    '''
+    def __init__(self, path, ttl = None, max_size = None, mode = 'use'):
+        mode_options = ['use','refresh','replay']
+        if mode_options.count(mode) != 1:
+            raise ValueError(f"'mode' input must be one of the following options: {', '.join(mode_options)}")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.mode = mode
+        self.lock = threading.Lock()
+
+    def key(self, url, click = None, container = None):
+        # Pages are addressed by a hash of the url, the sequence of clicks and the containers taken after each click
+        return hashlib.sha256(json.dumps([url, click] if container == None else [url, click, container]).encode('utf-8')).hexdigest()
+
+    def file(self, url, click = None, container = None):
+        return self.path / f'{self.key(url,click,container)}.json.gz'
+
+    def get(self, url, click = None, container = None):
+        '''
+            Purpose: To read the html for a url from the cache. Returns None if it's missing or expired
+            Assumptions: Other processes can share the cache's directory, so a page can be evicted by them at any point (which counts as missing)
+        '''
+        file = self.file(url,click,container)
+        if self.mode == 'refresh':
+            return None
+        try:
+            with gzip.open(file, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        if self.ttl != None and self.mode != 'replay' and time.time() - entry['scraped'] > self.ttl:
+            return None
+
+        # Touch the file so it counts as recently used (unless it's been evicted since it was read)
+        try:
+            os.utime(file)
+        except FileNotFoundError:
+            pass
+        return entry['pages']
+
+    def put(self, url, click, htmls, container = None):
+        '''
+            Purpose: To save the html for a url to the cache
+        '''
+        file = self.file(url,click,container)
+        temp = file.with_name(f'{file.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with gzip.open(temp, 'wt', encoding='utf-8') as f:
+            json.dump({'url':url, 'click':click, 'container':container, 'scraped':time.time(), 'pages':htmls}, f)
+        os.replace(temp, file)
+        self.evict()
+
+    def evict(self):
+        '''
+            Purpose: To remove the least recently used pages until the cache is within its maximum size
+            Assumptions: Other processes sharing the cache's directory can remove pages at the same time, so pages that vanish are skipped
+        '''
+        if self.max_size == None:
+            return
+        with self.lock:
+            files = []
+            for file in self.path.glob('*.json.gz'):
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, file))
+            files = sorted(files)
+            size = sum([x[1] for x in files])
+            for _, file_size, file in files:
+                if size <= self.max_size:
+                    break
+                file.unlink(missing_ok=True)
+                size -= file_size
+
+# Scrape websites as a stream
+def scrape_stream(
+        url_list,
+        click = None,
+        options = chrome_options,
+        pool_size = 1,
+        host_cap = None,
+        backend = 'chrome',
+        cache = None,
+        buffer = None,
+        container = None,
+        blocked = None,
+        wait_for = None,
+        timeout = 60,
+        retries = 2,
+        backoff = 5,
+        max_memory = 2*1024**3,
+        max_error_rate = 0.5,
+        errors = 'raise',
+    ):
+    '''
+        Purpose: To scrape the webpages of the inputted urls, handing over the raw html of each url as soon as it's scraped
+        Assumptions: We'll repeat the click for each url
+        Inputs:
+            - url_list = Url or list of urls to scrape. Urls grouped in a tuple are scraped one after another by the same driver (e.g. a match's
+                         details then its stats), with the clicks only made on the last url of the group
+            - click = Xpath or list of xpaths to click on for each url
+            - options = Chrome options used when launching each driver
+            - pool_size = Number of chrome drivers kept open to share the urls between
+            - host_cap = Maximum number of drivers allowed on the same host at once. If not specified, no cap
+            - backend = How the pages are fetched, options are:
+                - 'chrome' (default) = Render each page with a headless chrome driver.
+                - 'http' = Plain http requests through a pooled keep-alive session. Pages must not need javascript or clicks.
+                - 'auto' = Use 'http' when there's nothing to click, otherwise 'chrome'.
+            - cache = PageCache to read pages from and save scraped pages to. If not specified, every page is scraped
+            - buffer = Maximum number of scraped urls waiting to be picked up before the drivers pause. If not specified, twice the pool size. 0 = no limit
+            - container = Css selector (or list of them, one per click) of the element to take after each click instead of the whole page (see scrape_page)
+            - blocked = List of url patterns the drivers never load, e.g. blocked_resources. If not specified, nothing is blocked
+            - wait_for = Css selector (or list of them, one per url in a group) to wait for on each page. If specified, the drivers wait for these
+                         elements explicitly instead of implicitly waiting for every element
+            - timeout = Seconds to wait for each element before giving up
+            - retries = Number of times to retry a url that fails to scrape, pausing for backoff seconds before the first retry and doubling each time after
+            - backoff = Seconds to pause before the first retry
+            - max_memory = Bytes of memory a driver's processes can use before it's relaunched (see driver_memory). If not specified, drivers are only
+                           relaunched every ~100 pages
+            - max_error_rate = Share of a driver's last 10 attempts that can fail before it's relaunched, once it's made at least 5. Drivers that
+                               have crashed are always relaunched
+            - errors = What happens when a url still fails after its retries, options are:
+                - 'raise' (default) = Stop scraping and raise the error.
+                - 'skip' = Leave the url out of the output and carry on scraping the rest.
+        Output: Generator of (position in url_list, url, list of the page's html followed by the html after each click), in the order the urls finish.
+                For a group of urls, the htmls of each url in the group follow on from each other
+    '''
+    # Check the backend
+    backend_options = ['chrome','http','auto']
+    if backend_options.count(backend) != 1:
+        raise ValueError(f"'backend' input must be one of the following options: {', '.join(backend_options)}")
+    error_options = ['raise','skip']
+    if error_options.count(errors) != 1:
+        raise ValueError(f"'errors' input must be one of the following options: {', '.join(error_options)}")
+    if backend == 'auto':
+        backend = 'http' if click == None else 'chrome'
+    if backend == 'http' and click != None:
+        raise ValueError("'click' can only be used with the 'chrome' backend")
+
+    # Depends on number of calls required we might need to relaunch the webdriver a few times
+    click = click if click == None or isinstance(click,list) else [click]
+    calls_per_url = len(click) if click != None else 1
+    relaunch = max(floor(100/calls_per_url),1)
+
+    # A driver's error rate is only checked once it's made this many attempts, so a failure or two on a fresh driver doesn't relaunch it
+    min_outcomes = 5
+    url_list = url_list if isinstance(url_list,list) else [url_list]
+
+    # Queue up the urls, keeping track of their position in the inputted list
+    work = queue.Queue()
+    for i, url in enumerate(url_list):
+        work.put((i,url))
+
+    # Scraped pages are handed over through a bounded queue, so the drivers can't race too far ahead of whoever is reading them
+    results = queue.Queue(maxsize = 2*pool_size if buffer == None else buffer)
+    stop = threading.Event()
+    finished = object()
+
+    # Cap the number of drivers that can hit the same host at once
+    hosts = set(urlparse(x).netloc for url in url_list for x in (url if isinstance(url,tuple) else (url,)))
+    host_cap = pool_size if host_cap == None else host_cap
+    host_slots = {host : threading.BoundedSemaphore(host_cap) for host in hosts}
+
+    # All http workers share one session so connections are reused
+    session = http_session(pool_size) if backend == 'http' else None
+
+    # Wait for space in the results queue, giving up if the stream has been closed
+    def send(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    # Each worker keeps its own driver warm and pulls urls off the queue until it's empty
+    def worker():
+        driver = None
+        visits = 0
+        outcomes = deque(maxlen=10) # Whether each of the driver's last attempts failed (cleared whenever the driver is relaunched)
+        try:
+            while not stop.is_set():
+                try:
+                    i, url = work.get_nowait()
+                except queue.Empty:
+                    break
+
+                # Check the cache first
+                htmls = cache.get(url,click,container) if cache != None else None
+                if cache != None:
+                    metrics.recorder.count('cache_hits' if htmls != None else 'cache_misses')
+                if htmls == None:
+                    if cache != None and cache.mode == 'replay':
+                        raise KeyError(f'{url} is not in the page cache')
+
+                    # Scrape the url, retrying with a longer pause after each failed attempt
+                    group = url if isinstance(url,tuple) else (url,)
+                    waits = wait_for if isinstance(wait_for,list) else [wait_for] * len(group)
+                    for attempt in range(retries+1):
+                        try:
+                            # Plain http doesn't need chrome
+                            if session != None:
+                                htmls = []
+                                for x in group:
+                                    with host_slots[urlparse(x).netloc]:
+                                        htmls = htmls + http_scrape_page(session,x)
+
+                            # Otherwise launch chrome if needed and scrape the pages, only clicking on the last one
+                            else:
+                                if driver == None:
+                                    driver = launch_driver(options,blocked,None if wait_for != None else 60)
+                                    visits = 0
+                                    outcomes.clear()
+                                htmls = []
+                                with host_slots[urlparse(group[0]).netloc]:
+                                    for j, x in enumerate(group):
+                                        last = j == len(group) - 1
+                                        htmls = htmls + scrape_page(driver,x,click if last else None,container if last else None,waits[j],timeout)
+                                visits += 1
+                            outcomes.append(0)
+                            break
+                        except Exception as e:
+                            htmls = None
+                            outcomes.append(1)
+                            metrics.recorder.count('scrape_errors')
+                            print(f'    - Failed to scrape {url} ({type(e).__name__}), attempt {attempt+1} of {retries+1}')
+
+                            # Relaunch the driver if it's crashed or too many of its recent urls have failed
+                            if driver != None and (not driver_alive(driver) or (len(outcomes) >= min_outcomes and sum(outcomes) / len(outcomes) >= max_error_rate)):
+                                quit_driver(driver)
+                                driver = None
+                                metrics.recorder.count('driver_recycles_errors')
+
+                            # Give up on the url once it's out of retries
+                            if attempt == retries:
+                                if errors == 'raise':
+                                    raise
+                                metrics.recorder.count('failed_urls')
+                            else:
+                                metrics.recorder.count('retries')
+                                stop.wait(backoff * 2**attempt)
+                    if htmls == None:
+                        continue
+
+                    # Relaunch the driver once it's using too much memory or has made enough visits
+                    if driver != None:
+                        memory = driver_memory(driver) if max_memory != None else None
+                        reason = 'driver_recycles_memory' if memory != None and memory > max_memory else 'driver_relaunches' if visits >= relaunch else None
+                        if reason != None:
+                            metrics.recorder.count(reason)
+                            quit_driver(driver)
+                            driver = None
+
+                    # Save to the cache
+                    if cache != None:
+                        cache.put(url,click,htmls,container)
+
+                # Hand over the scraped page
+                send((i,url,htmls))
+        except Exception as e:
+            send(e)
+        finally:
+            # Close driver
+            if driver != None:
+                quit_driver(driver)
+            send(finished)
+
+    # Run the workers
+    workers = [threading.Thread(target=worker) for _ in range(max(min(pool_size,len(url_list)),1))]
+    for w in workers:
+        w.start()
+
+    # Pass on the scraped pages until every worker has finished
+    try:
+        running = len(workers)
+        while running > 0:
+            item = results.get()
+            if item is finished:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+        for w in workers:
+            w.join()
+        if session != None:
+            session.close()
+
+# Scrape website
+def web_scrape(
+        url_list,
+        click = None,
+        options = chrome_options,
+        pool_size = 1,
+        host_cap = None,
+        backend = 'chrome',
+        cache = None,
+        parse = True,
+        container = None,
+        blocked = None,
+        wait_for = None,
+        timeout = 60,
+        **kwargs,
+    ):
+    '''
+        Purpose: To scrape the webpages of the inputted urls
+        Assumptions: We'll repeat the click for each url
+        Inputs:
+            - url_list, click, options, pool_size, host_cap, backend, cache, container, blocked, wait_for, timeout = See scrape_stream
+            - parse = Parse the pages with beautiful soup. If False, each url's raw html is returned as a list of the page followed by each clicked page
+            - **kwargs = Retry & driver recycling options passed on to scrape_stream (retries, backoff, max_memory, max_error_rate, errors).
+                         Urls skipped with errors='skip' are returned as None
+    '''
+    # Scrape every url, putting them back in the inputted order
+    url_list = url_list if isinstance(url_list,list) else [url_list]
+    soups = [None] * len(url_list)
+    for i, url, htmls in scrape_stream(url_list,click,options,pool_size,host_cap,backend,cache,0,container,blocked,wait_for,timeout,**kwargs):
+        soups[i] = make_soup(htmls,click) if parse else htmls
+
+    # Output
+    if len(soups) == 1:
+        return soups[0]
+    else:
+        return soups
+
+# Scrape website one page at a time
+def iter_scrape(
+        url_list,
+        click = None,
+        options = chrome_options,
+        pool_size = 1,
+        host_cap = None,
+        backend = 'chrome',
+        cache = None,
+        buffer = None,
+        parse = True,
+        container = None,
+        blocked = None,
+        wait_for = None,
+        timeout = 60,
+        **kwargs,
+    ):
+    '''
+        Purpose: To scrape the webpages of the inputted urls, yielding each one as soon as it's scraped so they never all sit in memory at once
+        Inputs:
+            - url_list, click, options, pool_size, host_cap, backend, cache, buffer, container, blocked, wait_for, timeout = See scrape_stream
+            - parse = Parse the pages with beautiful soup. If False, the raw html is yielded instead
+            - **kwargs = Retry & driver recycling options passed on to scrape_stream (retries, backoff, max_memory, max_error_rate, errors)
+        Output: Generator of (url, soup, pages) in the order the urls finish. pages is None if there's nothing to click
+    '''
+    for i, url, htmls in scrape_stream(url_list,click,options,pool_size,host_cap,backend,cache,buffer,container,blocked,wait_for,timeout,**kwargs):
+        if click == None:
+            yield url, make_soup(htmls) if parse else htmls[0], None
+        elif parse:
+            soup, pages = make_soup(htmls,click)
+            yield url, soup, pages
+        else:
+            yield url, htmls[0], htmls[1:]
+
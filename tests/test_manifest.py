@@ -0,0 +1,51 @@
+'''
+    Filename: test_manifest.py
+    Purpose: To check the fixture manifests used by incremental scraping take their excluded fixtures from the tournament's config on every run.
+    Usage: python -m pytest tests/ (from the repo's root)
+'''
+
+##################################################################################################################################
+''' Importing packages and fixing pathway '''
+##################################################################################################################################
+# Import packages
+import os, sys, json
+import pandas as pd
+
+# Fix pathway
+module_path = os.path.abspath(os.path.join(''))
+if module_path not in sys.path:
+    sys.path.append(module_path)
+
+# Import functions
+import scripts.useful_functions as uf
+
+
+##################################################################################################################################
+''' Tests '''
+##################################################################################################################################
+# Fixtures listed on the matches page
+fixtures = [f'https://www.rugbyworldcup.com/2023/match/m{i}#stats' for i in range(1,5)]
+
+# A fixture excluded in the config after the manifest was saved is skipped
+def test_config_exclusions_apply_to_existing_manifest(tmp_path):
+    path = tmp_path / 'manifest_rwc.json'
+    with open(path,'w') as f:
+        json.dump({'ingested' : fixtures[:1], 'excluded' : {'m4#' : 'Excluded on an earlier run'}}, f)
+    manifest = uf.load_manifest(path,{'m3#' : 'Excluded in the config'})
+    assert manifest['excluded'] == {'m3#' : 'Excluded in the config'}
+    assert uf.new_fixtures(fixtures,manifest) == fixtures[1:2] + fixtures[3:]
+
+# The manifest saved with a dataset only holds the fixtures ingested
+def test_saved_manifest_only_holds_ingested(tmp_path):
+    path = tmp_path / 'manifest_rwc.json'
+    filepath = f'{tmp_path}/'
+    df = pd.DataFrame({'Date':['9 September 2023'], 'Team':['Ireland'], 'Opposition':['Romania'], 'No.':['1'], 'Player':['Andrew Porter']})
+    manifest = uf.load_manifest(path,{'m3#' : 'Excluded in the config'})
+    uf.save_ingested(df,'player_data_rwc',filepath,fixtures[:1],manifest,path)
+    with open(path) as f:
+        assert json.load(f) == {'ingested' : fixtures[:1]}
+
+    # Dropping the exclusion from the config scrapes the fixture again
+    manifest = uf.load_manifest(path,{},'player_data_rwc',filepath)
+    assert manifest == {'ingested' : fixtures[:1], 'excluded' : {}}
+    assert uf.new_fixtures(fixtures,manifest) == fixtures[1:]